@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class ApiCallStats:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.pages = 0
+        self.total_latency_in_seconds = 0.0
+        self.max_latency_in_seconds = 0.0
+
+    def record(self, latency_in_seconds, pages, error):
+        self.count += 1
+        self.errors += 1 if error else 0
+        self.pages += pages
+        self.total_latency_in_seconds += latency_in_seconds
+        self.max_latency_in_seconds = max(self.max_latency_in_seconds, latency_in_seconds)
+        for index, upper_bound in enumerate(self.buckets):
+            if latency_in_seconds <= upper_bound:
+                self.bucket_counts[index] += 1
+                break
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'retries': self.retries,
+            'pages': self.pages,
+            'total_latency_in_seconds': round(self.total_latency_in_seconds, 4),
+            'max_latency_in_seconds': round(self.max_latency_in_seconds, 4),
+            # Cumulative like prometheus histograms so each bucket reads as "calls that took at most this long"
+            'latency_histogram': {str(upper_bound): sum(self.bucket_counts[:index + 1])
+                                  for index, upper_bound in enumerate(self.buckets)},
+        }
+
+
+class ApiMetrics:
+    # Upper bounds of the latency histogram buckets in seconds
+    LATENCY_BUCKETS_IN_SECONDS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+    METRICS_DIR = '.'
+    PROMETHEUS_METRIC_PREFIX = 'design_review_api'
+
+    def __init__(self, metrics_dir=METRICS_DIR):
+        self.metrics_dir = metrics_dir
+        self.lock = threading.Lock()
+        self.reset()
+
+    # Starts a new run -- long running processes should call this before each job
+    def reset(self):
+        with self.lock:
+            self.stats_by_api = defaultdict(lambda: ApiCallStats(self.LATENCY_BUCKETS_IN_SECONDS))
+            self.run_started_at = time.time()
+
+    # Times the wrapped call. The yielded dict can be used to report how many pages the call fetched
+    @contextmanager
+    def time_call(self, api):
+        call = {'pages': 1}
+        start = time.perf_counter()
+        error = False
+        try:
+            yield call
+        except Exception:
+            error = True
+            raise
+        finally:
+            latency_in_seconds = time.perf_counter() - start
+            with self.lock:
+                self.stats_by_api[api].record(latency_in_seconds, call['pages'], error)
+
+    def record_retry(self, api):
+        with self.lock:
+            self.stats_by_api[api].retries += 1
+
+    def get_summary(self):
+        with self.lock:
+            return {
+                'run_started_at': self.run_started_at,
+                'run_duration_in_seconds': round(time.time() - self.run_started_at, 4),
+                'apis': {api: stats.to_dict() for api, stats in sorted(self.stats_by_api.items())},
+            }
+
+    # Short human readable version for the run email
+    def format_summary(self):
+        summary = self.get_summary()
+        lines = ['Run took {:.2f}s'.format(summary['run_duration_in_seconds'])]
+        for api, stats in summary['apis'].items():
+            lines.append('{api}: {count} calls, {errors} errors, {retries} retries, {pages} pages, '
+                         '{total_latency_in_seconds}s total, {max_latency_in_seconds}s max'.format(api=api, **stats))
+        return '\n\t'.join(lines)
+
+    def to_prometheus_text(self, job):
+        summary = self.get_summary()
+        prefix = self.PROMETHEUS_METRIC_PREFIX
+        lines = []
+        for api, stats in summary['apis'].items():
+            labels = 'job="{job}",api="{api}"'.format(job=job, api=api)
+            for upper_bound, count in stats['latency_histogram'].items():
+                bucket = '+Inf' if upper_bound == 'inf' else upper_bound
+                lines.append('{}_latency_seconds_bucket{{{},le="{}"}} {}'.format(prefix, labels, bucket, count))
+            lines.append('{}_latency_seconds_sum{{{}}} {}'.format(prefix, labels, stats['total_latency_in_seconds']))
+            lines.append('{}_latency_seconds_count{{{}}} {}'.format(prefix, labels, stats['count']))
+            for name in ['errors', 'retries', 'pages']:
+                lines.append('{}_{}_total{{{}}} {}'.format(prefix, name, labels, stats[name]))
+        lines.append('{}_run_duration_seconds{{job="{}"}} {}'.format(prefix, job,
+                                                                      summary['run_duration_in_seconds']))
+        return '\n'.join(lines) + '\n'
+
+    def __write_atomically(self, file_name, contents):
+        # Write to a temp file and rename so that a textfile collector never reads a half written file
+        path = os.path.join(self.metrics_dir, file_name)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as filehandle:
+            filehandle.write(contents)
+        os.replace(temp_path, path)
+
+    # Writes the run summary as JSON and as a prometheus textfile -- called at the end of each run
+    def write_run_summary(self, job):
+        self.__write_atomically('{}_metrics.json'.format(job), json.dumps(self.get_summary(), indent=2))
+        self.__write_atomically('{}.prom'.format(job), self.to_prometheus_text(job))
@@ -0,0 +1,87 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class ApiResponseCache:
+    CACHE_FILE = 'api_response_cache.db'
+    # Max number of entries kept on disk -- least recently used entries are evicted first once we go over
+    MAX_ENTRIES = 5000
+    # How long to wait on another process holding a write lock before giving up -- same as StateStore
+    BUSY_TIMEOUT_IN_SECONDS = 30
+
+    SR_REVIEW_GROUP_MEMBERS = 'sr_review_group_members'
+    OOO_EVENTS = 'ooo_events'
+    OPEN_ISSUE_COUNTS = 'open_issue_counts'
+    # Time to live in seconds for each type of resource we cache
+    TTL_IN_SECONDS_BY_RESOURCE = {
+        SR_REVIEW_GROUP_MEMBERS: 6 * 60 * 60,
+        OOO_EVENTS: 30 * 60,
+        OPEN_ISSUE_COUNTS: 15 * 60,
+    }
+
+    def __init__(self, cache_file=CACHE_FILE, max_entries=MAX_ENTRIES, ttl_in_seconds_by_resource=None):
+        self.max_entries = max_entries
+        self.ttl_in_seconds_by_resource = dict(self.TTL_IN_SECONDS_BY_RESOURCE)
+        self.ttl_in_seconds_by_resource.update(ttl_in_seconds_by_resource or {})
+        # Clients look things up from worker threads so the connection is shared behind a lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(cache_file, timeout=self.BUSY_TIMEOUT_IN_SECONDS, check_same_thread=False,
+                                          isolation_level=None)
+        # Both crons share the cache -- WAL lets one read while the other writes
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS api_responses ('
+                                'resource TEXT NOT NULL, '
+                                'key TEXT NOT NULL, '
+                                'value TEXT NOT NULL, '
+                                'expires_at REAL NOT NULL, '
+                                'accessed_at REAL NOT NULL, '
+                                'PRIMARY KEY (resource, key))')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS api_responses_accessed_at '
+                                'ON api_responses (accessed_at)')
+
+    # Returns the cached value or None if there is no entry or it has expired
+    def get(self, resource, key):
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute('SELECT value FROM api_responses '
+                                          'WHERE resource = ? AND key = ? AND expires_at > ?',
+                                          (resource, key, now)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute('UPDATE api_responses SET accessed_at = ? WHERE resource = ? AND key = ?',
+                                    (now, resource, key))
+        return json.loads(row[0])
+
+    def set(self, resource, key, value):
+        now = time.time()
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO api_responses VALUES (?, ?, ?, ?, ?)',
+                                    (resource, key, json.dumps(value),
+                                     now + self.ttl_in_seconds_by_resource[resource], now))
+            self.__evict(now)
+
+    # Wraps a fetch so that it is only called on a cache miss
+    def get_or_fetch(self, resource, key, fetch):
+        value = self.get(resource, key)
+        if value is None:
+            value = fetch()
+            self.set(resource, key, value)
+        return value
+
+    # Drops a single entry or, if no key is passed, every entry for the resource. Should be called after any write
+    # that would make the cached response stale
+    def invalidate(self, resource, key=None):
+        with self.lock:
+            if key is None:
+                self.connection.execute('DELETE FROM api_responses WHERE resource = ?', (resource,))
+            else:
+                self.connection.execute('DELETE FROM api_responses WHERE resource = ? AND key = ?', (resource, key))
+
+    def __evict(self, now):
+        self.connection.execute('DELETE FROM api_responses WHERE expires_at <= ?', (now,))
+        self.connection.execute('DELETE FROM api_responses WHERE rowid IN ('
+                                'SELECT rowid FROM api_responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                                (self.max_entries,))
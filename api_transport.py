@@ -0,0 +1,105 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+# Status codes that are worth retrying -- anything else is a real error and retrying would only delay the failure
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+THROTTLED_STATUS_CODE = 429
+
+
+# Retry-After can either be a number of seconds or an HTTP date
+def parse_retry_after(value):
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    # Rate limiter shared by every thread making calls to one API. The rate adapts to the API: it is halved every time
+    # we get throttled and creeps back up with every successful call so that we saturate quota without tripping it
+    MIN_RATE_FRACTION = 0.1
+    RECOVERY_FRACTION_PER_SUCCESS = 0.01
+
+    def __init__(self, requests_per_second, burst=None):
+        self.max_rate = float(requests_per_second)
+        self.rate = self.max_rate
+        self.capacity = float(burst if burst is not None else requests_per_second)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def __refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    # Blocks until cost tokens are available. Costs larger than the bucket (e.g. a big batch) wait for a full bucket
+    def acquire(self, cost=1):
+        cost = min(float(cost), self.capacity)
+        while True:
+            with self.lock:
+                self.__refill()
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                wait_in_seconds = (cost - self.tokens) / self.rate
+            time.sleep(wait_in_seconds)
+
+    def on_throttled(self):
+        with self.lock:
+            self.rate = max(self.max_rate * self.MIN_RATE_FRACTION, self.rate / 2)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.RECOVERY_FRACTION_PER_SUCCESS)
+
+
+class RetryingTransport:
+    # Wraps every outbound call with rate limiting and retries. get_retry_info is supplied by each client since only it
+    # knows how its library reports errors -- it takes an exception and returns (is_retryable, retry_after_in_seconds,
+    # is_throttled)
+    MAX_ATTEMPTS = 5
+    BASE_DELAY_IN_SECONDS = 0.5
+    MAX_DELAY_IN_SECONDS = 30.0
+
+    def __init__(self, rate_limiter, metrics, get_retry_info, max_attempts=MAX_ATTEMPTS,
+                 base_delay_in_seconds=BASE_DELAY_IN_SECONDS, max_delay_in_seconds=MAX_DELAY_IN_SECONDS):
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        self.get_retry_info = get_retry_info
+        self.max_attempts = max_attempts
+        self.base_delay_in_seconds = base_delay_in_seconds
+        self.max_delay_in_seconds = max_delay_in_seconds
+
+    def __get_delay(self, attempt, retry_after_in_seconds):
+        if retry_after_in_seconds is not None:
+            return min(self.max_delay_in_seconds, retry_after_in_seconds)
+        # Full jitter so that concurrent workers that failed together don't all retry together
+        return random.uniform(0, min(self.max_delay_in_seconds, self.base_delay_in_seconds * 2 ** attempt))
+
+    # cost is the number of requests the call counts for against quota (e.g. the size of a batch)
+    def call(self, api, fn, cost=1):
+        for attempt in range(self.max_attempts):
+            self.rate_limiter.acquire(cost)
+            try:
+                result = fn()
+            except Exception as ex:
+                is_retryable, retry_after_in_seconds, is_throttled = self.get_retry_info(ex)
+                if not is_retryable or attempt == self.max_attempts - 1:
+                    raise
+                if is_throttled:
+                    self.rate_limiter.on_throttled()
+                self.metrics.record_retry(api)
+                time.sleep(self.__get_delay(attempt, retry_after_in_seconds))
+            else:
+                self.rate_limiter.on_success()
+                return result
@@ -1,18 +1,28 @@
-import traceback
+import argparse
+import asyncio
 
-from google_api_client import GoogleApiClient
-from jira_api_client import JiraApiClient
+from board_clients import create_clients
+from job_runner import run_job
+from review_board import ReviewBoard
 from senior_reviewer_assignment_tool import SeniorReviewAssignmentTool
 from toolbox import UpdateType
 
-google_client = GoogleApiClient()
-jira_client = JiraApiClient()
 
+def assign_senior_reviewers(google_client, jira_client, state_store, async_mode=False):
+    def assign():
+        if async_mode:
+            tool = asyncio.run(SeniorReviewAssignmentTool.create_async(google_client, jira_client, state_store))
+        else:
+            tool = SeniorReviewAssignmentTool(google_client, jira_client, state_store)
+        tool.assign_sr_reviewers_to_open_tickets()
 
-try:
-    SeniorReviewAssignmentTool(google_client, jira_client).assign_sr_reviewers_to_open_tickets()
-except Exception as ex:
-    # This is not entirely safe as a failure while creating the google or jira client would throw errors not
-    # caught -- however the cron email will catch these errors and its still worth sending a more descriptive
-    # error here if possible
-    google_client.send_pagerduty_email(ex, traceback.format_exc(), UpdateType.SENIOR_REVIEWER_ASSIGNMENT)
\ No newline at end of file
+    run_job(UpdateType.SENIOR_REVIEWER_ASSIGNMENT, google_client, state_store, assign)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Assigns senior reviewers to open design reviews')
+    parser.add_argument('--board', default=ReviewBoard.DEFAULT_BOARD, help='Review board in the config file to run')
+    parser.add_argument('--config', default=ReviewBoard.CONFIG_FILE, help='Review board config file')
+    parser.add_argument('--async-mode', action='store_true', help='Run independent API calls concurrently')
+    args = parser.parse_args()
+    assign_senior_reviewers(*create_clients(ReviewBoard.load_board(args.board, args.config)), args.async_mode)
@@ -0,0 +1,49 @@
+import asyncio
+
+
+# Async facades over GoogleApiClient and JiraApiClient (or their fakes) for the asyncio execution mode. Every call runs
+# the blocking client method in a worker thread so that independent calls can be awaited together with asyncio.gather.
+# Jira searches are generators in the sync clients and are collected into lists here since they can't be consumed
+# lazily across threads
+
+
+class AsyncGoogleApiClient:
+    def __init__(self, google_api_client):
+        self.client = google_api_client
+
+    async def get_sr_review_members(self):
+        return await asyncio.to_thread(self.client.get_sr_review_members)
+
+    async def get_sr_review_emails(self):
+        return await asyncio.to_thread(self.client.get_sr_review_emails)
+
+    async def get_days_available(self, sr_review_emails):
+        return await asyncio.to_thread(self.client.get_days_available, sr_review_emails)
+
+    async def get_in_person_review_meetings(self, end_date, max_results=None):
+        return await asyncio.to_thread(self.client.get_in_person_review_meetings, end_date, max_results)
+
+    async def get_busy_intervals(self, emails, start_date, end_date):
+        return await asyncio.to_thread(self.client.get_busy_intervals, emails, start_date, end_date)
+
+    async def update_in_person_review_meeting_with_assigned_design_review(self, event_id, fields_to_update):
+        return await asyncio.to_thread(self.client.update_in_person_review_meeting_with_assigned_design_review,
+                                       event_id, fields_to_update)
+
+
+class AsyncJiraApiClient:
+    def __init__(self, jira_api_client):
+        self.client = jira_api_client
+
+    async def get_issues_to_assign(self):
+        return await asyncio.to_thread(lambda: list(self.client.get_issues_to_assign()))
+
+    async def get_open_issue_counts_by_senior_reviewer(self, ldaps):
+        return await asyncio.to_thread(self.client.get_open_issue_counts_by_senior_reviewer, ldaps)
+
+    async def get_issues_requiring_in_person_review_scheduling(self):
+        return await asyncio.to_thread(lambda: list(self.client.get_issues_requiring_in_person_review_scheduling()))
+
+    # Returns the exception if the update failed and None if it succeeded, like JiraApiClient.update_issues
+    async def update_issue(self, issue, fields):
+        return (await asyncio.to_thread(self.client.update_issues, [(issue, fields)]))[0][1]
@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+import tracemalloc
+
+from fake_api_clients import FakeBackend, create_fake_clients, get_fake_review_board
+from in_person_design_review_scheduler import InPersonDesignReviewSchedulingTool
+from senior_reviewer_assignment_tool import SeniorReviewAssignmentTool
+from update_digest_tool import UpdateDigestTool
+
+# Drives both tools through the real API clients against fake Google services and a fake Jira at increasing scale and
+# reports wall time, API call counts and peak memory. Nothing here touches the network so any concurrency, caching or
+# rate limiting change can be measured locally, e.g.
+#   python benchmark.py --sizes 10 100 1000 --latency 0.05
+# Wall time includes waiting on the clients' own rate limits unless --no-rate-limits is passed
+DEFAULT_SIZES = [10, 100, 1000]
+# Twice as many meetings as issues so that every issue can find a slot its guests are free for
+MEETINGS_PER_ISSUE = 2
+
+
+def run_senior_reviewer_assignment(size, backend, data_dir, async_mode, rate_limited):
+    google_client, jira_client, state_store = create_fake_clients(backend, get_fake_review_board(data_dir), size, size,
+                                                                  rate_limited=rate_limited)
+    if async_mode:
+        tool = asyncio.run(SeniorReviewAssignmentTool.create_async(google_client, jira_client, state_store))
+    else:
+        tool = SeniorReviewAssignmentTool(google_client, jira_client, state_store)
+    tool.assign_sr_reviewers_to_open_tickets()
+    UpdateDigestTool(google_client, state_store).send_update_digest()
+
+
+def run_in_person_review_scheduling(size, backend, data_dir, async_mode, rate_limited):
+    count_meetings = size * MEETINGS_PER_ISSUE
+    google_client, jira_client, state_store = create_fake_clients(backend, get_fake_review_board(data_dir), size, size,
+                                                                  count_meetings, rate_limited)
+    # Meetings are an hour apart so make sure the horizon covers all of them
+    tool = InPersonDesignReviewSchedulingTool(google_client, jira_client, state_store,
+                                              scheduling_horizon_in_days=count_meetings // 24 + 2)
+    if async_mode:
+        asyncio.run(tool.schedule_in_person_reviews_async())
+    else:
+        tool.schedule_in_person_reviews()
+
+
+def measure(name, run, size, args):
+    backend = FakeBackend(args.latency, args.page_size, args.error_rate, args.seed)
+    with tempfile.TemporaryDirectory() as data_dir:
+        tracemalloc.start()
+        start = time.perf_counter()
+        error = None
+        try:
+            run(size, backend, data_dir, args.async_mode, not args.no_rate_limits)
+        except Exception as ex:
+            # Tools raise when they could not finish everything (e.g. injected errors or not enough slots) -- that is
+            # still a complete run worth reporting
+            error = str(ex)[:200]
+        wall_time = time.perf_counter() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'tool': name,
+        'size': size,
+        'wall_time_in_seconds': round(wall_time, 4),
+        'api_calls': sum(backend.call_counts.values()),
+        'api_calls_by_name': dict(backend.call_counts),
+        'peak_memory_in_kb': peak_memory // 1024,
+        'error': error,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmarks both design review tools against fake API services')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Number of reviewers, issues and meetings to run with')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of latency added to every API call')
+    parser.add_argument('--page-size', type=int, default=100, help='Largest page the fake services return')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probability that any API call fails')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--async-mode', action='store_true', help='Run the tools in asyncio execution mode')
+    parser.add_argument('--no-rate-limits', action='store_true',
+                        help="Don't wait on the clients' rate limits so that only latency and concurrency are measured")
+    parser.add_argument('--json', action='store_true', help='Print results as JSON lines')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    for size in args.sizes:
+        for name, run in [('senior_reviewer_assignment', run_senior_reviewer_assignment),
+                          ('in_person_review_scheduling', run_in_person_review_scheduling)]:
+            result = measure(name, run, size, args)
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print('{tool:<30} size={size:<6} wall={wall_time_in_seconds:>8.3f}s api_calls={api_calls:<6} '
+                      'peak_memory={peak_memory_in_kb}KB{error_message}'.format(
+                          error_message='' if result['error'] is None else ' error=' + result['error'], **result))
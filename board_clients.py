@@ -0,0 +1,18 @@
+import os
+
+from api_metrics import ApiMetrics
+from api_response_cache import ApiResponseCache
+from google_api_client import GoogleApiClient
+from jira_api_client import JiraApiClient
+from state_store import StateStore
+
+
+# Creates the clients and state store for a board with every local file kept in the board's data dir. Both clients share
+# one on-disk cache so that frequent runs mostly read local state rather than hitting the APIs and one metrics instance
+# so that the run summary covers every outbound call
+def create_clients(board):
+    os.makedirs(board.data_dir, exist_ok=True)
+    cache = ApiResponseCache(board.get_path(ApiResponseCache.CACHE_FILE))
+    metrics = ApiMetrics(board.data_dir)
+    return GoogleApiClient(board, cache, metrics=metrics), JiraApiClient(board, cache, metrics), \
+        StateStore(board.get_path(StateStore.STATE_FILE))
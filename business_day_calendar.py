@@ -0,0 +1,65 @@
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+import holidays
+
+
+class BusinessDayCalendar:
+    DEFAULT_COUNTRY = 'US'
+    # Saturday and Sunday as returned by date.weekday()
+    WEEKEND = (5, 6)
+    # Window of years precomputed around the current year -- lookups outside of it raise
+    YEARS_BEFORE_CURRENT = 1
+    YEARS_AFTER_CURRENT = 3
+
+    __calendars_by_region = {}
+
+    def __init__(self, country=DEFAULT_COUNTRY, subdiv=None, first_year=None, last_year=None):
+        current_year = date.today().year
+        self.first_year = first_year if first_year is not None else current_year - self.YEARS_BEFORE_CURRENT
+        self.last_year = last_year if last_year is not None else current_year + self.YEARS_AFTER_CURRENT
+        region_holidays = holidays.country_holidays(country, subdiv=subdiv,
+                                                    years=range(self.first_year, self.last_year + 1))
+
+        # Sorted ordinals of every business day in the window -- this lets us answer every question with a bisect
+        # rather than walking day by day
+        days = [date.fromordinal(ordinal) for ordinal in range(date(self.first_year, 1, 1).toordinal(),
+                                                               date(self.last_year, 12, 31).toordinal() + 1)]
+        self.business_day_ordinals = [day.toordinal() for day in days
+                                      if day.weekday() not in self.WEEKEND and day not in region_holidays]
+
+    # Calendars are expensive to build so we only ever build one per region
+    @classmethod
+    def for_region(cls, country=DEFAULT_COUNTRY, subdiv=None):
+        if (country, subdiv) not in cls.__calendars_by_region:
+            cls.__calendars_by_region[(country, subdiv)] = cls(country, subdiv)
+        return cls.__calendars_by_region[(country, subdiv)]
+
+    def __check_in_window(self, day):
+        if not self.first_year <= day.year <= self.last_year:
+            raise ValueError('{day} is outside of the business day calendar ({first_year} to {last_year})'.format(
+                day=day, first_year=self.first_year, last_year=self.last_year))
+
+    def is_business_day(self, day):
+        self.__check_in_window(day)
+        index = bisect_left(self.business_day_ordinals, day.toordinal())
+        return index < len(self.business_day_ordinals) and self.business_day_ordinals[index] == day.toordinal()
+
+    # Returns the date count business days after start -- start itself is never counted so a count of 1 is the next
+    # business day. A count of 0 returns start
+    def get_x_business_days_from(self, start, count):
+        if count == 0:
+            return start
+        self.__check_in_window(start)
+        index = bisect_right(self.business_day_ordinals, start.toordinal()) + count - 1
+        if index >= len(self.business_day_ordinals):
+            raise ValueError('{count} business days from {start} is outside of the business day calendar'.format(
+                count=count, start=start))
+        return date.fromordinal(self.business_day_ordinals[index])
+
+    # Counts business days after start up to and including end
+    def count_business_days_between(self, start, end):
+        self.__check_in_window(start)
+        self.__check_in_window(end)
+        return max(0, bisect_right(self.business_day_ordinals, end.toordinal())
+                   - bisect_right(self.business_day_ordinals, start.toordinal()))
@@ -0,0 +1,86 @@
+import json
+import sqlite3
+import threading
+import time
+
+from toolbox import CalendarTime
+
+
+class CalendarEventStore:
+    STORE_FILE = 'calendar_event_store.db'
+    CANCELLED_STATUS = 'cancelled'
+    # How long to wait on another process holding a write lock before giving up -- same as StateStore
+    BUSY_TIMEOUT_IN_SECONDS = 30
+
+    def __init__(self, store_file=STORE_FILE):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(store_file, timeout=self.BUSY_TIMEOUT_IN_SECONDS, check_same_thread=False,
+                                          isolation_level=None)
+        # WAL lets overlapping runs read while another one syncs
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS events ('
+                                'calendar_id TEXT NOT NULL, '
+                                'event_id TEXT NOT NULL, '
+                                'start_ts REAL NOT NULL, '
+                                'summary TEXT NOT NULL, '
+                                'description TEXT NOT NULL, '
+                                'event TEXT NOT NULL, '
+                                'PRIMARY KEY (calendar_id, event_id))')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS events_by_start ON events (calendar_id, start_ts)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS sync_tokens ('
+                                'calendar_id TEXT PRIMARY KEY, '
+                                'sync_token TEXT NOT NULL)')
+
+    def get_sync_token(self, calendar_id):
+        with self.lock:
+            row = self.connection.execute('SELECT sync_token FROM sync_tokens WHERE calendar_id = ?',
+                                          (calendar_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    # Applies a page of changed events from events.list -- cancelled events are removed and everything else is upserted.
+    # When reset is True everything we know about the calendar is dropped first (used for full resyncs). The sync token
+    # is only stored once all changes are applied so a failed sync never leaves us with a token that skips changes.
+    # Events that have already started are dropped as we only ever look up upcoming ones -- without this the store would
+    # keep every instance the calendar ever had
+    def apply_changes(self, calendar_id, events, next_sync_token=None, reset=False):
+        with self.lock:
+            self.connection.execute('BEGIN')
+            try:
+                if reset:
+                    self.connection.execute('DELETE FROM events WHERE calendar_id = ?', (calendar_id,))
+                    self.connection.execute('DELETE FROM sync_tokens WHERE calendar_id = ?', (calendar_id,))
+                for event in events:
+                    if event.get('status') == self.CANCELLED_STATUS:
+                        self.connection.execute('DELETE FROM events WHERE calendar_id = ? AND event_id = ?',
+                                                (calendar_id, event.get('id')))
+                    else:
+                        self.connection.execute('INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?)',
+                                                (calendar_id, event.get('id'),
+                                                 CalendarTime.to_timestamp(event.get('start')),
+                                                 event.get('summary') or '', event.get('description') or '',
+                                                 json.dumps(event)))
+                self.connection.execute('DELETE FROM events WHERE calendar_id = ? AND start_ts < ?',
+                                        (calendar_id, time.time()))
+                if next_sync_token is not None:
+                    self.connection.execute('INSERT OR REPLACE INTO sync_tokens VALUES (?, ?)',
+                                            (calendar_id, next_sync_token))
+                self.connection.execute('COMMIT')
+            except Exception:
+                self.connection.execute('ROLLBACK')
+                raise
+
+    # Looks up upcoming events in start time order using the start time index. Text filters are case insensitive
+    def get_events(self, calendar_id, start_date, end_date=None, summary_contains='', description_contains='',
+                   max_results=None):
+        end_ts = end_date.timestamp() if end_date is not None else float('inf')
+        with self.lock:
+            rows = self.connection.execute('SELECT event FROM events '
+                                           'WHERE calendar_id = ? AND start_ts >= ? AND start_ts < ? '
+                                           'AND instr(lower(summary), lower(?)) > 0 '
+                                           'AND instr(lower(description), lower(?)) > 0 '
+                                           'ORDER BY start_ts LIMIT ?',
+                                           (calendar_id, start_date.timestamp(), end_ts, summary_contains,
+                                            description_contains,
+                                            max_results if max_results is not None else -1)).fetchall()
+        return [json.loads(row[0]) for row in rows]
@@ -0,0 +1,332 @@
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+import httplib2
+from googleapiclient.errors import HttpError
+from jira import JIRAError
+from jira.client import ResultList
+
+from api_metrics import ApiMetrics
+from api_response_cache import ApiResponseCache
+from api_transport import TokenBucket
+from calendar_event_store import CalendarEventStore
+from google_api_client import GoogleApiClient
+from jira_api_client import JiraApiClient
+from review_board import ReviewBoard
+from state_store import StateStore
+from toolbox import Reviewer
+
+# In process stand ins for the Google services and the Jira library object that GoogleApiClient and JiraApiClient
+# wrap. The real clients are built on top of them (see benchmark.py) so that their batching, paging, caching, rate
+# limiting and retries all run without knox, credentials or network access. Every call can be given latency and
+# injected failures, which are raised as the same errors the real libraries raise so that they are retried
+
+# The fake Jira understands these queries rather than real JQL -- get_fake_review_board points the clients at them
+ISSUES_TO_ASSIGN_JQL = 'senior reviewer is empty'
+OPEN_ISSUES_FOR_SR_REVIEWERS_JQL = 'senior reviewer in ({ldaps})'
+IN_PERSON_DESIGN_REVIEW_REQUESTED_JQL = 'google calendar meeting is empty'
+IN_PERSON_REVIEW_CALENDAR = 'design-review-calendar@example.com'
+IN_PERSON_REVIEW_SUMMARY = 'in person design review'
+PLACEHOLDER_DESCRIPTION = 'In person design review\n\nReview this week: [Not Yet Assigned]'
+# Status the fakes fail with -- it is one the clients retry
+INJECTED_ERROR_STATUS = 503
+UNLIMITED_REQUESTS_PER_SECOND = 10 ** 9
+
+
+def create_http_error(api):
+    return HttpError(httplib2.Response({'status': INJECTED_ERROR_STATUS}),
+                     'Injected failure calling {}'.format(api).encode())
+
+
+def create_jira_error(api):
+    return JIRAError('Injected failure calling {}'.format(api), status_code=INJECTED_ERROR_STATUS)
+
+
+class FakeBackend:
+    # page_size caps how many results the fake services return per page, like a server side limit on page size
+    def __init__(self, latency_in_seconds=0.0, page_size=100, error_rate=0.0, seed=0):
+        self.latency_in_seconds = latency_in_seconds
+        self.page_size = page_size
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.call_counts = Counter()
+
+    # Every request that would have gone over the network goes through here -- counts the request, waits for the
+    # configured latency and fails at the configured rate with the error create_error builds
+    def call(self, api, create_error):
+        with self.lock:
+            self.call_counts[api] += 1
+            should_fail = self.random.random() < self.error_rate
+        if self.latency_in_seconds > 0:
+            time.sleep(self.latency_in_seconds)
+        if should_fail:
+            raise create_error(api)
+
+    # Returns one page of items along with the token for the next page, like Google list calls
+    def get_page(self, items, page_token, max_results):
+        start = int(page_token or 0)
+        end = start + min(max_results or self.page_size, self.page_size)
+        page = {'items': items[start:end]}
+        if end < len(items):
+            page['nextPageToken'] = str(end)
+        return page
+
+
+class FakeCredentials:
+    valid = True
+
+    def refresh(self, request):
+        pass
+
+
+class FakeRequest:
+    # Stands in for googleapiclient's HttpRequest -- get_response builds the response when the request is executed
+    def __init__(self, backend, api, get_response):
+        self.backend = backend
+        self.api = api
+        self.get_response = get_response
+
+    def execute(self, http=None, num_retries=0):
+        self.backend.call(self.api, create_http_error)
+        return self.get_response()
+
+
+class FakeBatchRequest:
+    # Stands in for googleapiclient's BatchHttpRequest -- the whole batch is a single request
+    def __init__(self, backend, api, callback):
+        self.backend = backend
+        self.api = api
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        self.backend.call(self.api, create_http_error)
+        for request_id, request in self.requests:
+            self.callback(request_id, request.get_response(), None)
+
+
+class FakeGroupsService:
+    def __init__(self, backend, emails):
+        self.backend = backend
+        self.members_list = [{'id': 'member-{}'.format(index), 'email': email, 'etag': 'etag'}
+                             for index, email in enumerate(emails)]
+
+    def members(self):
+        return self
+
+    def list(self, groupKey, roles=None, maxResults=None, pageToken=None):
+        def get_response():
+            page = self.backend.get_page(self.members_list, pageToken, maxResults)
+            page['members'] = page.pop('items')
+            return page
+
+        return FakeRequest(self.backend, 'directory.members.list', get_response)
+
+
+class FakeCalendarService:
+    # Holds the in person review meetings, OOO events and busy times for every guest. The meeting calendar supports
+    # incremental sync -- every patch bumps the version and a sync token is the version it was issued at
+    def __init__(self, backend, emails, count_meetings, busy_intervals_per_guest=2, ooo_events_per_guest=2,
+                 meeting_length_in_minutes=60):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.version = 0
+        self.version_by_meeting_id = {}
+        start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        self.meetings = {}
+        for index in range(count_meetings):
+            meeting_start = start + timedelta(hours=index)
+            self.meetings['meeting-{}'.format(index)] = {
+                'id': 'meeting-{}'.format(index),
+                'htmlLink': 'https://calendar.example.com/meeting-{}'.format(index),
+                'summary': IN_PERSON_REVIEW_SUMMARY.title(),
+                'description': PLACEHOLDER_DESCRIPTION,
+                'start': {'dateTime': meeting_start.isoformat()},
+                'end': {'dateTime': (meeting_start + timedelta(minutes=meeting_length_in_minutes)).isoformat()},
+            }
+            self.version_by_meeting_id['meeting-{}'.format(index)] = 0
+        horizon_in_seconds = max(1, count_meetings) * 60 * 60
+        self.busy_intervals_by_email = {}
+        self.ooo_events_by_email = {}
+        for email in emails:
+            starts = [start + timedelta(seconds=backend.random.randrange(horizon_in_seconds))
+                      for _ in range(busy_intervals_per_guest)]
+            self.busy_intervals_by_email[email] = [
+                {'start': busy_start.isoformat(), 'end': (busy_start + timedelta(minutes=30)).isoformat()}
+                for busy_start in starts]
+            ooo_days = [date.today() + timedelta(days=backend.random.randrange(7)) for _ in range(ooo_events_per_guest)]
+            self.ooo_events_by_email[email] = [
+                {'summary': GoogleApiClient.OOO_EVENTS_QUERY, 'start': {'date': day.isoformat()},
+                 'end': {'date': (day + timedelta(days=1)).isoformat()}}
+                for day in ooo_days]
+
+    def events(self):
+        return self
+
+    def freebusy(self):
+        return self
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatchRequest(self.backend, 'calendar.batch', callback)
+
+    def __get_meetings_page(self, page_token, max_results, sync_token):
+        with self.lock:
+            since_version = int(sync_token) if sync_token is not None else -1
+            meetings = [dict(meeting) for meeting_id, meeting in self.meetings.items()
+                        if self.version_by_meeting_id[meeting_id] > since_version]
+            page = self.backend.get_page(meetings, page_token, max_results)
+            if 'nextPageToken' not in page:
+                page['nextSyncToken'] = str(self.version)
+            return page
+
+    def list(self, calendarId, timeMin=None, timeMax=None, maxResults=None, orderBy=None, pageToken=None,
+             singleEvents=False, q=None, syncToken=None):
+        if calendarId == IN_PERSON_REVIEW_CALENDAR and q is None:
+            return FakeRequest(self.backend, 'calendar.events.list',
+                               lambda: self.__get_meetings_page(pageToken, maxResults, syncToken))
+        events = self.ooo_events_by_email.get(calendarId, []) if q == GoogleApiClient.OOO_EVENTS_QUERY else []
+        return FakeRequest(self.backend, 'calendar.events.list',
+                           lambda: self.backend.get_page(events, pageToken, maxResults))
+
+    def patch(self, calendarId, eventId, body):
+        def get_response():
+            with self.lock:
+                self.version += 1
+                self.version_by_meeting_id[eventId] = self.version
+                self.meetings[eventId].update(body)
+                return dict(self.meetings[eventId])
+
+        return FakeRequest(self.backend, 'calendar.events.patch', get_response)
+
+    def query(self, body):
+        return FakeRequest(self.backend, 'calendar.freebusy.query', lambda: {'calendars': {
+            item['id']: {'busy': self.busy_intervals_by_email.get(item['id'], [])} for item in body['items']}})
+
+
+class FakeMailService:
+    def __init__(self, backend):
+        self.backend = backend
+        self.sent_messages = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatchRequest(self.backend, 'gmail.batch', callback)
+
+    def send(self, userId, body):
+        def get_response():
+            self.sent_messages.append(body)
+            return {'id': 'message-{}'.format(len(self.sent_messages))}
+
+        return FakeRequest(self.backend, 'gmail.messages.send', get_response)
+
+
+class FakeUser:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeIssueFields:
+    def __init__(self, summary, assignee, reporter, approvers, points_of_contact):
+        self.summary = summary
+        self.assignee = FakeUser(assignee)
+        self.reporter = FakeUser(reporter)
+        self.customfield_1841234 = None
+        self.customfield_16501 = [FakeUser(ldap) for ldap in approvers]
+        self.customfield_16532 = [FakeUser(ldap) for ldap in points_of_contact]
+        self.customfield_18441 = None
+        self.customfield_18402 = None
+
+
+class FakeIssue:
+    # Stands in for jira's Issue
+    def __init__(self, backend, key, fields):
+        self.backend = backend
+        self.key = key
+        self.fields = fields
+
+    def update(self, fields=None, **kwargs):
+        self.backend.call('jira.issue.update', create_jira_error)
+        for field, value in dict(fields or {}, **kwargs).items():
+            setattr(self.fields, field, FakeUser(value['name']) if isinstance(value, dict) else value)
+
+
+class FakeSession:
+    def mount(self, prefix, adapter):
+        pass
+
+
+class FakeJira:
+    # Stands in for jira's JIRA -- search_issues pages through the issues matching one of the fake queries above
+    def __init__(self, backend, count_issues, ldaps, guests_per_issue=4):
+        self.backend = backend
+        self._session = FakeSession()
+        self.issues = [
+            FakeIssue(backend, 'MDR-{}'.format(index), FakeIssueFields(
+                'Design review {}'.format(index), *backend.random.sample(ldaps, 2),
+                approvers=backend.random.sample(ldaps, max(0, min(len(ldaps), guests_per_issue - 2))),
+                points_of_contact=[]))
+            for index in range(count_issues)
+        ]
+
+    def __get_matching_issues(self, jql):
+        if jql == ISSUES_TO_ASSIGN_JQL:
+            return [issue for issue in self.issues if issue.fields.customfield_18441 is None]
+        if jql == IN_PERSON_DESIGN_REVIEW_REQUESTED_JQL:
+            return [issue for issue in self.issues if issue.fields.customfield_18402 is None]
+        ldaps = set(re.findall(r'"([^"]+)"', jql))
+        return [issue for issue in self.issues
+                if issue.fields.customfield_18441 is not None and issue.fields.customfield_18441.name in ldaps]
+
+    def search_issues(self, jql, fields=None, startAt=0, maxResults=50):
+        self.backend.call('jira.search_issues', create_jira_error)
+        issues = self.__get_matching_issues(jql)
+        max_results = min(maxResults, self.backend.page_size)
+        return ResultList(issues[startAt:startAt + max_results], startAt, max_results, len(issues))
+
+
+def get_fake_review_board(data_dir, reviewer_capacities=None):
+    return ReviewBoard(name='benchmark', senior_review_group='senior-review-board@example.com',
+                       admin_email='design-review-admin@example.com',
+                       pagerduty_email='design-review-admin@example.pagerduty.com',
+                       senior_reviewer_assignment_jql=ISSUES_TO_ASSIGN_JQL,
+                       open_issues_for_sr_reviewers_jql=OPEN_ISSUES_FOR_SR_REVIEWERS_JQL,
+                       in_person_design_review_requested_jql=IN_PERSON_DESIGN_REVIEW_REQUESTED_JQL,
+                       in_person_review_calendar=IN_PERSON_REVIEW_CALENDAR,
+                       in_person_review_summary=IN_PERSON_REVIEW_SUMMARY, reviewer_capacities=reviewer_capacities,
+                       data_dir=data_dir)
+
+
+def get_fake_reviewer_emails(count):
+    return [Reviewer.get_pinterest_email_from_ldap('reviewer{}'.format(index)) for index in range(count)]
+
+
+# Builds the real clients and state store for board on top of fake services -- without rate limits the clients never
+# wait so that only latency and concurrency are measured
+def create_fake_clients(backend, board, count_reviewers, count_issues, count_meetings=0, rate_limited=True):
+    emails = get_fake_reviewer_emails(count_reviewers)
+    cache = ApiResponseCache(board.get_path(ApiResponseCache.CACHE_FILE))
+    metrics = ApiMetrics(board.data_dir)
+    google_client = GoogleApiClient(board, cache, CalendarEventStore(board.get_path(CalendarEventStore.STORE_FILE)),
+                                    metrics, credentials=FakeCredentials(),
+                                    groups_service=FakeGroupsService(backend, emails),
+                                    mail_service=FakeMailService(backend),
+                                    calendar_service=FakeCalendarService(backend, emails, count_meetings))
+    jira_client = JiraApiClient(board, cache, metrics, jira=FakeJira(
+        backend, count_issues, [Reviewer.get_ldap_from_pinterest_email(email) for email in emails]))
+    if not rate_limited:
+        for transport in list(google_client.transports.values()) + [jira_client.transport]:
+            transport.rate_limiter = TokenBucket(UNLIMITED_REQUESTS_PER_SECOND)
+    return google_client, jira_client, StateStore(board.get_path(StateStore.STATE_FILE))
@@ -1,14 +1,25 @@
 import base64
 import json
-from datetime import datetime, timedelta, date
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, date, timezone
 from email.mime.text import MIMEText
 
 import googleapiclient.discovery
-import holidays
+import httplib2
 from google.oauth2 import service_account
-from knox import AutoKnox
+from google_auth_httplib2 import AuthorizedHttp, Request
+from googleapiclient.errors import HttpError
 
+from api_metrics import ApiMetrics
+from api_transport import RETRYABLE_STATUS_CODES, THROTTLED_STATUS_CODE, RetryingTransport, TokenBucket, \
+    parse_retry_after
+from api_response_cache import ApiResponseCache
+from business_day_calendar import BusinessDayCalendar
+from calendar_event_store import CalendarEventStore
 from senior_reviewer_assignment_tool import SeniorReviewAssignmentTool
+from toolbox import CalendarTime
 
 
 class GoogleApiClient:
@@ -20,44 +31,124 @@ class GoogleApiClient:
         'https://www.googleapis.com/auth/calendar'
     ]
     SERVICE_ACCOUNT_EMAIL = 'svc-m10design@pinterest.com'
-    SENIOR_REVIEW_GROUP = 'm10n-senior-design-review-board@pinterest.com'
-    M10N_ADMIN_EMAIL = 'm10n-design-review-admin@pinterest.com'
-    PAGERDUTY_EMAIL = 'mdr-admin@pinterest.pagerduty.com'
-    US_HOLIDAYS = holidays.US()
+    HOLIDAY_CALENDAR_COUNTRY = 'US'
     GOOGLE_DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+    OOO_EVENTS_QUERY = 'Out of office'
+    # Max page size for directory members.list
+    MAX_GROUP_MEMBERS_PER_PAGE = 200
+    # Google rejects batches with more than 50 calls and the Calendar API is rate limited per user so we keep the
+    # number of batches in flight small
+    MAX_REQUESTS_PER_BATCH = 50
+    MAX_CONCURRENT_BATCHES = 4
 
-    def __init__(self):
+    # Calendar returns 410 GONE when a sync token has expired and a full resync is required
+    SYNC_TOKEN_EXPIRED_STATUS = 410
+    # A gateway timing out says nothing about whether the request behind it went through
+    GATEWAY_TIMEOUT_STATUS = 504
+
+    # Each API has its own quota so each gets its own rate limiter. A batch counts as one request per call it contains
+    # against quota so buckets are allowed to burst to a full batch
+    REQUESTS_PER_SECOND_BY_SERVICE = {'calendar': 10, 'directory': 20, 'gmail': 5}
+    # Google reports some quota errors as 403 with one of these reasons rather than as 429
+    RATE_LIMIT_ERROR_REASONS = [b'rateLimitExceeded', b'userRateLimitExceeded']
+    HTTP_TIMEOUT_IN_SECONDS = 60
+
+    # credentials and the services are normally read from knox and built from discovery documents -- they can be passed
+    # in instead, e.g. so that benchmark.py can run this client against fake services
+    def __init__(self, board, cache=None, event_store=None, metrics=None, credentials=None, groups_service=None,
+                 mail_service=None, calendar_service=None):
+        # Board specific settings -- see ReviewBoard
+        self.senior_review_group = board.senior_review_group
+        self.admin_email = board.admin_email
+        self.pagerduty_email = board.pagerduty_email
+        self.sr_review_emails_override = board.sr_review_emails_override
+        self.reviewer_capacities = board.reviewer_capacities
+        self.in_person_review_calendar = board.in_person_review_calendar
+        self.in_person_review_summary = board.in_person_review_summary
+        self.subject_prefix = '[{}] '.format(board.name)
+        # The cache can be shared with the jira client so that both crons read from the same local state
+        self.cache = cache if cache is not None else ApiResponseCache(board.get_path(ApiResponseCache.CACHE_FILE))
+        self.event_store = event_store if event_store is not None \
+            else CalendarEventStore(board.get_path(CalendarEventStore.STORE_FILE))
+        self.metrics = metrics if metrics is not None else ApiMetrics(board.data_dir)
+        self.business_days = BusinessDayCalendar.for_region(self.HOLIDAY_CALENDAR_COUNTRY)
+        self.transports = {service: RetryingTransport(
+            TokenBucket(requests_per_second, burst=max(requests_per_second, self.MAX_REQUESTS_PER_BATCH)),
+            self.metrics, self.__get_send_retry_info if service == 'gmail' else self.__get_retry_info)
+            for service, requests_per_second in self.REQUESTS_PER_SECOND_BY_SERVICE.items()}
+        self.local = threading.local()
+        self.credentials = credentials if credentials is not None else self.__get_credentials_from_knox()
+        # All three services share one pooled transport rather than each creating their own
+        self.groups_service = groups_service if groups_service is not None \
+            else googleapiclient.discovery.build('admin', 'directory_v1', http=self.__get_http())
+        self.mail_service = mail_service if mail_service is not None \
+            else googleapiclient.discovery.build('gmail', 'v1', http=self.__get_http())
+        self.calendar_service = calendar_service if calendar_service is not None \
+            else googleapiclient.discovery.build('calendar', 'v3', http=self.__get_http())
+
+    def __get_credentials_from_knox(self):
+        # Imported here so that knox is only needed where real credentials are read
+        from knox import AutoKnox
         credentials_from_knox = json.loads(AutoKnox(self.KNOX_CREDENTIALS).get_primary().strip())
         svc_acct_credentials = service_account.Credentials.from_service_account_info(
             credentials_from_knox, scopes=self.SCOPES)
-        delegated = svc_acct_credentials.with_subject(self.SERVICE_ACCOUNT_EMAIL)
-        self.groups_service = googleapiclient.discovery.build('admin', 'directory_v1', credentials=delegated)
-        self.mail_service = googleapiclient.discovery.build('gmail', 'v1', credentials=delegated)
-        self.calendar_service = googleapiclient.discovery.build('calendar', 'v3', credentials=delegated)
+        return svc_acct_credentials.with_subject(self.SERVICE_ACCOUNT_EMAIL)
+
+    # Service account tokens are short lived -- long running processes should call this before each run. Only refreshes
+    # when the current token has expired so this is free most of the time
+    def refresh_credentials_if_expired(self):
+        if not self.credentials.valid:
+            self.credentials.refresh(Request(httplib2.Http()))
+
+    # httplib2 connections are not thread safe so every thread gets its own authorized transport. The transport is
+    # kept on the thread and reused for every call it makes so that connections are kept alive rather than reopened
+    def __get_http(self):
+        if getattr(self.local, 'http', None) is None:
+            self.local.http = AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=self.HTTP_TIMEOUT_IN_SECONDS))
+        return self.local.http
+
+    # Returns (is_retryable, retry_after_in_seconds, is_throttled) for an exception raised by a call
+    def __get_retry_info(self, ex):
+        if isinstance(ex, HttpError):
+            is_rate_limit_error = any(reason in (ex.content or b'') for reason in self.RATE_LIMIT_ERROR_REASONS)
+            is_throttled = ex.resp.status == THROTTLED_STATUS_CODE or (ex.resp.status == 403 and is_rate_limit_error)
+            return is_throttled or ex.resp.status in RETRYABLE_STATUS_CODES, \
+                parse_retry_after(ex.resp.get('retry-after')), is_throttled
+        # Dropped keep-alive connections and timeouts are worth another go
+        if isinstance(ex, (socket.timeout, ConnectionError, httplib2.HttpLib2Error)):
+            self.local.http = None
+            return True, None, False
+        return False, None, False
 
-    def __create_message(self, message_text, subject, to=M10N_ADMIN_EMAIL):
+    # Sending email is not idempotent -- after a timeout or a dropped connection Gmail may already have accepted the
+    # message and a retry would send it twice. Sends are only retried when Gmail itself answered with an error
+    def __get_send_retry_info(self, ex):
+        is_retryable, retry_after_in_seconds, is_throttled = self.__get_retry_info(ex)
+        is_answered = isinstance(ex, HttpError) and ex.resp.status != self.GATEWAY_TIMEOUT_STATUS
+        return is_retryable and is_answered, retry_after_in_seconds, is_throttled
+
+    # Every outbound call goes through here so that it is rate limited, retried, timed and counted. execute is called
+    # once per attempt and cost is the number of requests the call counts for against quota
+    def __call(self, api, execute, cost=1):
+        return self.transports[api.split('.')[0]].call(api, execute, cost)
+
+    def __execute(self, api, request):
+        def execute():
+            with self.metrics.time_call(api):
+                return request.execute(http=self.__get_http())
+
+        return self.__call(api, execute)
+
+    def __create_message(self, message_text, subject, to):
         message = MIMEText(message_text)
         message['to'] = to
-        message['subject'] = subject
-        return {'raw': base64.urlsafe_b64encode(message.as_string())}
-
-    def __is_business_day(self, date):
-        return date.weekday() not in holidays.WEEKEND and date not in self.US_HOLIDAYS
-
-    # get the date x business days from the start date (specified by count)
-    def __get_x_business_days_from(self, start, count=0):
-        one_day = timedelta(days=1)
-        next_day = start + one_day
-        for d in range(0, count):
-            while not self.__is_business_day(next_day):
-                next_day += one_day
-        return next_day
-
-    def __get_events(self, calendar_id, start_date=None, end_date=None,
-                     max_results=100, order_by=None, q=None, single_events=False):
-        events = []
-        page_token = None
+        # Tells boards apart when several of them send to the same inbox
+        message['subject'] = self.subject_prefix + subject
+        # Gmail wants the raw message as url safe base64 text
+        return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
 
+    def __list_events_request(self, calendar_id, start_date=None, end_date=None, max_results=100, order_by=None,
+                              q=None, single_events=False, page_token=None, sync_token=None):
         if start_date is not None:
             start = start_date.strftime(self.GOOGLE_DATE_FORMAT)
         else:
@@ -68,70 +159,248 @@ class GoogleApiClient:
         else:
             end = None
 
+        return self.calendar_service.events().list(
+            calendarId=calendar_id, timeMin=start, timeMax=end,
+            maxResults=max_results, orderBy=order_by,
+            pageToken=page_token, singleEvents=single_events, q=q, syncToken=sync_token)
+
+    # Pulls every event changed since the sync token was issued, or every upcoming event if there is no sync token.
+    # Returns the changed events along with the token to use for the next sync
+    def __get_changed_events(self, calendar_id, sync_token=None):
+        events = []
+        page_token = None
+        # Calendar does not allow time bounds to be combined with a sync token -- the initial full sync is bounded
+        # instead and the token remembers those bounds
+        start_date = datetime.utcnow() if sync_token is None else None
+
         while True:
-            events_results_page = self.calendar_service.events().list(
-                calendarId=calendar_id, timeMin=start, timeMax=end,
-                maxResults=max_results, orderBy=order_by,
-                pageToken=page_token, singleEvents=single_events, q=q).execute()
+            events_results_page = self.__execute('calendar.events.list', self.__list_events_request(
+                calendar_id, start_date, max_results=250, single_events=True, page_token=page_token,
+                sync_token=sync_token))
             events += events_results_page.get('items', [])
             page_token = events_results_page.get('nextPageToken')
             if not page_token:
-                break
-        return events
-
-    def __is_available(self, email, start_date, end_date):
-        # For now we are just checking the number of OOO events in the next 7 days
-        # Already added some utilities to help compute business days but in this case
-        # We need to worry about time zones so leaving as simple for now -- can improve later
-        # also note that we are deduplicating by start time in case people have the same OOO
-        # marked on multiple calendars
-        days_ooo = len({
-            event.get('start').get('dateTime'): event
-            for event in self.__get_events(email, start_date, end_date, q='Out of office')
-        }.values())
-        days_available_to_review = SeniorReviewAssignmentTool.REVIEW_SLA_IN_DAYS - days_ooo
-        return days_available_to_review >= SeniorReviewAssignmentTool.MIN_DAYS_AVAILABLE_FOR_ASSIGNMENT
+                return events, events_results_page.get('nextSyncToken')
 
-    def get_sr_review_emails(self):
+    # Brings the local event store up to date with the calendar -- only changed events are pulled unless the calendar
+    # has never been synced or the sync token has expired
+    def __sync_events(self, calendar_id):
+        sync_token = self.event_store.get_sync_token(calendar_id)
+        if sync_token is not None:
+            try:
+                events, next_sync_token = self.__get_changed_events(calendar_id, sync_token)
+                self.event_store.apply_changes(calendar_id, events, next_sync_token)
+                return
+            except HttpError as ex:
+                if ex.resp.status != self.SYNC_TOKEN_EXPIRED_STATUS:
+                    raise
+
+        events, next_sync_token = self.__get_changed_events(calendar_id)
+        self.event_store.apply_changes(calendar_id, events, next_sync_token, reset=True)
+
+    def __execute_events_batch(self, page_tokens_by_email, start_date, end_date):
+        # A failed call in the batch fails the whole batch so a retry rebuilds and resends all of it
+        def execute():
+            pages_by_email = {}
+
+            def on_response(email, response, exception):
+                if exception is not None:
+                    raise exception
+                pages_by_email[email] = response
+
+            batch = self.calendar_service.new_batch_http_request(callback=on_response)
+            for email, page_token in page_tokens_by_email:
+                batch.add(self.__list_events_request(email, start_date, end_date, q=self.OOO_EVENTS_QUERY,
+                                                     page_token=page_token), request_id=email)
+            with self.metrics.time_call('calendar.events.list.batch') as call:
+                call['pages'] = len(page_tokens_by_email)
+                batch.execute(http=self.__get_http())
+            return pages_by_email
+
+        return self.__call('calendar.events.list.batch', execute, cost=len(page_tokens_by_email))
+
+    # Fetches OOO events for every email using batched requests (one HTTP round trip per 50 calendars) executed
+    # concurrently -- calendars that have more than one page of results are followed up in the next round
+    def __get_ooo_events_by_email(self, emails, start_date, end_date):
+        cache_key = '{email}:{start}:{end}'
+        cached_events_by_email = {email: self.cache.get(ApiResponseCache.OOO_EVENTS,
+                                                        cache_key.format(email=email, start=start_date, end=end_date))
+                                  for email in emails}
+        events_by_email = {email: [] for email, events in cached_events_by_email.items() if events is None}
+        page_tokens_by_email = {email: None for email in events_by_email}
+
+        with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_BATCHES) as executor:
+            while len(page_tokens_by_email) > 0:
+                pending = list(page_tokens_by_email.items())
+                batches = [pending[i:i + self.MAX_REQUESTS_PER_BATCH]
+                           for i in range(0, len(pending), self.MAX_REQUESTS_PER_BATCH)]
+                page_tokens_by_email = {}
+                for pages_by_email in executor.map(
+                        lambda batch: self.__execute_events_batch(batch, start_date, end_date), batches):
+                    for email, page in pages_by_email.items():
+                        events_by_email[email] += page.get('items', [])
+                        if page.get('nextPageToken'):
+                            page_tokens_by_email[email] = page.get('nextPageToken')
+
+        for email, events in events_by_email.items():
+            self.cache.set(ApiResponseCache.OOO_EVENTS, cache_key.format(email=email, start=start_date, end=end_date),
+                           events)
+            cached_events_by_email[email] = events
+        return cached_events_by_email
+
+    # Returns the dates an event covers between window_start and window_end (inclusive). Timed events use the date in
+    # the event's own time zone and all day events have an exclusive end date
+    @staticmethod
+    def __get_dates_covered(event, window_start, window_end):
+        start, end = event.get('start'), event.get('end')
+        if start.get('dateTime') is not None:
+            first_day = datetime.fromisoformat(start.get('dateTime').replace('Z', '+00:00')).date()
+            end_time = datetime.fromisoformat(end.get('dateTime').replace('Z', '+00:00'))
+            # an event ending exactly at midnight does not cover the day it ends on
+            last_day = (end_time - timedelta(microseconds=1)).date()
+        else:
+            first_day = date.fromisoformat(start.get('date'))
+            last_day = date.fromisoformat(end.get('date')) - timedelta(days=1)
+        first_day, last_day = max(first_day, window_start), min(last_day, window_end)
+        return {first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)}
+
+    def __get_days_available(self, ooo_events, start_date, review_due_date):
+        # Counts the business days in the SLA window covered by OOO events -- dates are collected in a set so the same
+        # OOO marked on multiple calendars or overlapping OOO events are only counted once
+        ooo_dates = set()
+        for event in ooo_events:
+            ooo_dates |= self.__get_dates_covered(event, start_date + timedelta(days=1), review_due_date)
+        days_ooo = len([day for day in ooo_dates if self.business_days.is_business_day(day)])
+        return self.business_days.count_business_days_between(start_date, review_due_date) - days_ooo
+
+    # Pages through every member with the role -- only id, email and etag are kept
+    def __get_group_members(self, group_key, role):
+        members = []
+        page_token = None
+        while True:
+            page = self.__execute('directory.members.list', self.groups_service.members().list(
+                groupKey=group_key, roles=role, maxResults=self.MAX_GROUP_MEMBERS_PER_PAGE, pageToken=page_token))
+            members += [{'id': member['id'], 'email': member['email'], 'etag': member.get('etag', '')}
+                        for member in page.get('members', [])]
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                return members
+
+    # Returns the senior review group as {'id', 'email', 'etag'} dicts
+    def get_sr_review_members(self):
         # This assumes members with MANAGER role to be senior reviewers while members with OWNER role are admins
-        group = self.groups_service.members().list(groupKey=self.SENIOR_REVIEW_GROUP, roles='MANAGER').execute()
-        emails = [member['email'] for member in group['members']]
-        # TODO remove this and return emails instead once we're ready to assign to actual people
-        return ["lucilla@pinterest.com", "vbannister@pinterest.com"]
+        members = self.cache.get_or_fetch(ApiResponseCache.SR_REVIEW_GROUP_MEMBERS,
+                                          '{}:MANAGER'.format(self.senior_review_group),
+                                          lambda: self.__get_group_members(self.senior_review_group, 'MANAGER'))
+        if len(self.sr_review_emails_override) > 0:
+            members_by_email = {member['email']: member for member in members}
+            # Override reviewers who are not in the group are keyed by their email
+            return [members_by_email.get(email, {'id': email, 'email': email, 'etag': ''})
+                    for email in self.sr_review_emails_override]
+        return members
 
-    def get_availability(self, sr_review_emails):
+    def get_sr_review_emails(self):
+        return [member['email'] for member in self.get_sr_review_members()]
+
+    # Returns the number of business days each reviewer is not OOO within the review SLA
+    def get_days_available(self, sr_review_emails):
         now = date.today()
-        review_due_date = self.__get_x_business_days_from(now, SeniorReviewAssignmentTool.REVIEW_SLA_IN_DAYS)
+        review_due_date = self.business_days.get_x_business_days_from(
+            now, SeniorReviewAssignmentTool.REVIEW_SLA_IN_DAYS)
 
-        map = {email: self.__is_available(email, now, review_due_date) for email in sr_review_emails}
-        return map
+        # timeMax is exclusive so query through the end of the due date
+        ooo_events_by_email = self.__get_ooo_events_by_email(sr_review_emails, now, review_due_date + timedelta(days=1))
+        return {email: self.__get_days_available(ooo_events_by_email[email], now, review_due_date)
+                for email in sr_review_emails}
+
+    def get_availability(self, sr_review_emails):
+        return {email: days_available >= SeniorReviewAssignmentTool.MIN_DAYS_AVAILABLE_FOR_ASSIGNMENT
+                for email, days_available in self.get_days_available(sr_review_emails).items()}
 
-    def get_in_person_review_meetings(self, max_results):
-        now = datetime.utcnow()
+    # Returns in person review meetings starting between now and end_date in start time order
+    def get_in_person_review_meetings(self, end_date, max_results=None):
         # TODO: REPLACE THIS -- this is a hack because I was not able to access the m10n-design-review calendar
         #  we should have a separate calendar where these events are stored
-        return self.__get_events('lucilla@pinterest.com', start_date=now, max_results=max_results,
-                                 q='m10n in person design review', single_events=True, order_by='startTime')
+        self.__sync_events(self.in_person_review_calendar)
+        return self.event_store.get_events(self.in_person_review_calendar, datetime.now(timezone.utc), end_date,
+                                           summary_contains=self.in_person_review_summary, max_results=max_results)
+
+    def __query_free_busy(self, emails, start_date, end_date):
+        body = {
+            'timeMin': start_date.strftime(self.GOOGLE_DATE_FORMAT),
+            'timeMax': end_date.strftime(self.GOOGLE_DATE_FORMAT),
+            'items': [{'id': email} for email in emails],
+        }
+        return self.__execute('calendar.freebusy.query', self.calendar_service.freebusy().query(body=body)) \
+            .get('calendars', {})
+
+    # Returns {email: [(start_ts, end_ts)]} of busy intervals between the two dates. Calendars we can't read (e.g.
+    # people outside of the domain) come back with errors rather than busy times and are treated as free
+    def get_busy_intervals(self, emails, start_date, end_date):
+        # The in person review calendar owner is on every review meeting so their busy times would block every slot
+        emails = [email for email in dict.fromkeys(emails) if email != self.in_person_review_calendar]
+        batches = [emails[i:i + self.MAX_REQUESTS_PER_BATCH]
+                   for i in range(0, len(emails), self.MAX_REQUESTS_PER_BATCH)]
+        busy_intervals_by_email = {email: [] for email in emails}
+        with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_BATCHES) as executor:
+            for calendars in executor.map(lambda batch: self.__query_free_busy(batch, start_date, end_date), batches):
+                for email, calendar in calendars.items():
+                    busy_intervals_by_email[email] = [
+                        (CalendarTime.to_timestamp({'dateTime': busy.get('start')}),
+                         CalendarTime.to_timestamp({'dateTime': busy.get('end')}))
+                        for busy in calendar.get('busy', [])]
+        return busy_intervals_by_email
 
     # TODO replace calanderId once we are able to access m10n-design-review calendar -- note that to make updates
     #  service account needs to be added to calander with update permissions
     def update_in_person_review_meeting_with_assigned_design_review(self, event_id, fields_to_update):
         # Using events.patch rather than events.update here so that we only have to pass back the fields to update
         # this protects against unintentional updates if event data gets corrupted
-        return self.calendar_service.events().patch(calendarId='lucilla@pinterest.com',
-                                                    eventId=event_id,
-                                                    body=fields_to_update).execute()
+        updated_meeting = self.__execute('calendar.events.patch', self.calendar_service.events().patch(
+            calendarId=self.in_person_review_calendar, eventId=event_id, body=fields_to_update))
+        # Keep the local store in step with our own write so the meeting is no longer found as unassigned -- the change
+        # will also come back in the next incremental sync which is harmless
+        self.event_store.apply_changes(self.in_person_review_calendar, [updated_meeting])
+        return updated_meeting
+
+    # Sends one digest email per update type with a single batch request. updates_by_type is {UpdateType: [update]}
+    # and run_summaries_by_type is {UpdateType: [API call summary of each run]} -- see ApiMetrics.format_summary.
+    # Returns {UpdateType: exception} for digests that could not be sent -- callers keep those updates for next time
+    def send_update_digests(self, updates_by_type, run_summaries_by_type=None):
+        run_summaries_by_type = run_summaries_by_type or {}
+        update_types_by_request_id = {update_type.name: update_type for update_type in updates_by_type}
+
+        def execute():
+            errors_by_type = {}
+
+            def on_response(request_id, response, exception):
+                if exception is not None:
+                    errors_by_type[update_types_by_request_id[request_id]] = exception
 
-    def send_email_with_updates(self, updates, update_type):
-        message_text = "The following updates have been made:\n\t" \
-                       + "\n\t".join([json.dumps(update) for update in updates])
-        subject = "MDR Cron Updates: " + update_type.value
-        message = self.__create_message(message_text, subject)
+            batch = self.mail_service.new_batch_http_request(callback=on_response)
+            for update_type, updates in updates_by_type.items():
+                message_text = "The following updates have been made:\n\t" \
+                               + "\n\t".join([json.dumps(update) for update in updates])
+                if len(run_summaries_by_type.get(update_type, [])) > 0:
+                    message_text += "\n\nAPI calls by run:\n\t" + "\n\t".join(
+                        summary.replace('\n\t', '\n\t\t') for summary in run_summaries_by_type[update_type])
+                subject = "MDR Cron Updates: {update_type} ({count})".format(update_type=update_type.value,
+                                                                             count=len(updates))
+                message = self.__create_message(message_text, subject, self.admin_email)
+                batch.add(self.mail_service.users().messages().send(userId='me', body=message),
+                          request_id=update_type.name)
+            with self.metrics.time_call('gmail.messages.send.batch') as call:
+                call['pages'] = len(updates_by_type)
+                batch.execute(http=self.__get_http())
+            return errors_by_type
 
-        return self.mail_service.users().messages().send(userId='me', body=message).execute()
+        if len(updates_by_type) == 0:
+            return {}
+        return self.__call('gmail.messages.send.batch', execute, cost=len(updates_by_type))
 
     def send_pagerduty_email(self, error, stacktrace, update_type):
         message_text = '{error}\n\nStacktrace:\n{stacktrace}'.format(error=error, stacktrace=stacktrace)
         subject = "Exception while making updates: " + update_type.value
-        message = self.__create_message(message_text, subject, self.PAGERDUTY_EMAIL)
-        return self.mail_service.users().messages().send(userId='me', body=message).execute()
\ No newline at end of file
+        message = self.__create_message(message_text, subject, self.pagerduty_email)
+        return self.__execute('gmail.messages.send', self.mail_service.users().messages().send(userId='me',
+                                                                                              body=message))
\ No newline at end of file
@@ -1,24 +1,34 @@
+import asyncio
 import json
-from collections import deque
+from datetime import datetime, timedelta, timezone
 
-from toolbox import UpdateType, Reviewer
+from async_api_clients import AsyncGoogleApiClient, AsyncJiraApiClient
+from review_slot_matcher import ReviewSlotMatcher
+from state_store import StateStore
+from toolbox import UpdateType, UpdateStatus, Reviewer, CalendarTime
 
 
 class InPersonDesignReviewSchedulingTool:
     UNSCHEDULED_DESIGN_REVIEW_PLACEHOLDER_TEXT = 'Review this week: [Not Yet Assigned]'
-    COUNT_MEETINGS_TO_SCHEDULE_AHEAD = 4
+    # How far ahead we look for open review slots -- in person reviews are held weekly so this is about 4 meetings
+    SCHEDULING_HORIZON_IN_DAYS = 28
 
-    def __init__(self, google_api_client, jira_api_client):
+    def __init__(self, google_api_client, jira_api_client, state_store=None,
+                 scheduling_horizon_in_days=SCHEDULING_HORIZON_IN_DAYS):
         self.google_api_client = google_api_client
         self.jira_api_client = jira_api_client
+        self.state_store = state_store if state_store is not None else StateStore()
+        self.horizon_end = datetime.now(timezone.utc) + timedelta(days=scheduling_horizon_in_days)
         self.updated_events = []
+        self.pending_issue_updates = []
 
     def __get_issue_queue(self):
-        # dequeue guarantees O(1) perf
-        return deque(self.jira_api_client.get_issues_requiring_in_person_review_scheduling())
+        # Issues come back in created order which is the order they should be prioritized in
+        return list(self.jira_api_client.get_issues_requiring_in_person_review_scheduling())
 
-    def __get_available_design_review_meetings(self):
-        all_meetings = self.google_api_client.get_in_person_review_meetings(self.COUNT_MEETINGS_TO_SCHEDULE_AHEAD)
+    def __get_available_design_review_meetings(self, all_meetings=None):
+        if all_meetings is None:
+            all_meetings = self.google_api_client.get_in_person_review_meetings(self.horizon_end)
         # TODO This isn't really a good way to find out if a meeting has been assigned -- figure out something better
         return [meeting for meeting in all_meetings
                 if self.UNSCHEDULED_DESIGN_REVIEW_PLACEHOLDER_TEXT in meeting.get('description')]
@@ -67,38 +77,131 @@ class InPersonDesignReviewSchedulingTool:
 
         return [{'email': Reviewer.get_pinterest_email_from_ldap(ldap)} for ldap in deduped_guests]
 
-    def __assign_issue_to_meeting(self, issue, meeting):
-        # Update gcal first as it is easier to recover from a partial failure where meeting is updated but issue is not
-        meeting_fields_to_update = {
+    def __get_meeting_fields_to_update(self, issue, meeting, guests):
+        return {
             'description': self.__update_description(meeting, issue),
-            'attendees': self.__get_required_guests_emails_from_issue(issue),
+            'attendees': guests,
         }
-        updated_meeting = self.google_api_client.update_in_person_review_meeting_with_assigned_design_review(
-            meeting.get('id'), meeting_fields_to_update)
 
-        # update issue with meeting link
-        issue.update(customfield_18402=meeting.get('htmlLink'))
+    @staticmethod
+    def __get_issue_fields_to_update(meeting):
+        return {'customfield_18402': meeting.get('htmlLink')}
+
+    def __assign_issue_to_meeting(self, issue, meeting, guests):
+        # Update gcal first as it is easier to recover from a partial failure where meeting is updated but issue is not
+        updated_meeting = self.google_api_client.update_in_person_review_meeting_with_assigned_design_review(
+            meeting.get('id'), self.__get_meeting_fields_to_update(issue, meeting, guests))
 
+        # issue is updated with the meeting link once all meetings have been assigned -- see __flush_issue_updates
+        self.pending_issue_updates.append((issue, self.__get_issue_fields_to_update(meeting)))
         self.updated_events.append({'issue': issue.key, 'meeting': updated_meeting})
 
+    # Async version of __assign_issue_to_meeting -- the issue is linked as soon as its own meeting has been updated
+    # rather than waiting for every meeting. Errors are returned rather than raised so that one failure can't cancel
+    # the other assignments -- returns (error updating the meeting, error linking the issue) with None for success
+    async def __assign_issue_to_meeting_async(self, google, jira, issue, meeting, guests):
+        try:
+            updated_meeting = await google.update_in_person_review_meeting_with_assigned_design_review(
+                meeting.get('id'), self.__get_meeting_fields_to_update(issue, meeting, guests))
+        except Exception as ex:
+            return ex, None
+        error = await jira.update_issue(issue, self.__get_issue_fields_to_update(meeting))
+        self.updated_events.append({'issue': issue.key, 'meeting': updated_meeting,
+                                    'status': UpdateStatus.describe(error)})
+        return None, error
+
+    def __flush_issue_updates(self):
+        results = self.jira_api_client.update_issues(self.pending_issue_updates)
+        self.pending_issue_updates = []
+
+        status_by_issue_key = {issue.key: UpdateStatus.describe(error) for issue, error in results}
+        for updated_event in self.updated_events:
+            updated_event['status'] = status_by_issue_key[updated_event['issue']]
+        return [issue.key for issue, error in results if error is not None]
+
+    # Works out which issue goes in which meeting for every pending issue and open meeting at once -- guests can't be
+    # busy at the meeting time or double booked across overlapping meetings and older issues get priority. Returns the
+    # list of (issue, meeting, guests) to assign
+    def __match_issues_to_meetings(self, issues, meetings):
+        guests_by_issue = [self.__get_required_guests_emails_from_issue(issue) for issue in issues]
+        guest_emails_by_issue = [[guest['email'] for guest in guests] for guests in guests_by_issue]
+        busy_intervals_by_guest = self.google_api_client.get_busy_intervals(
+            [email for emails in guest_emails_by_issue for email in emails], datetime.now(timezone.utc),
+            self.horizon_end)
+
+        slots = [(CalendarTime.to_timestamp(meeting.get('start')), CalendarTime.to_timestamp(meeting.get('end')))
+                 for meeting in meetings]
+        meeting_by_issue = ReviewSlotMatcher(slots, busy_intervals_by_guest).match(guest_emails_by_issue)
+        return [(issues[issue], meetings[meeting], guests_by_issue[issue])
+                for issue, meeting in sorted(meeting_by_issue.items(), key=lambda assignment: slots[assignment[1]])]
+
     def schedule_in_person_reviews(self):
         issues_to_schedule = self.__get_issue_queue()
+        scheduled = set()
+        meeting_errors = {}
 
-        # If we have no issues to schedule may as well save the API call to get calendar events
-        if len(issues_to_schedule) > 0:
-            for in_person_review_meeting in self.__get_available_design_review_meetings():
-                # If we have no more issues to schedule we're done!
-                if len(issues_to_schedule) == 0:
-                    break
-                self.__assign_issue_to_meeting(issues_to_schedule.popleft(), in_person_review_meeting)
-
+        # If we have no issues to schedule may as well save the API calls to get calendar events and free/busy
         if len(issues_to_schedule) > 0:
+            meetings = self.__get_available_design_review_meetings()
+            if len(meetings) > 0:
+                for issue, meeting, guests in self.__match_issues_to_meetings(issues_to_schedule, meetings):
+                    # A failed meeting update must not stop us linking the meetings that were already updated --
+                    # otherwise those issues would be booked into a second meeting next run
+                    try:
+                        self.__assign_issue_to_meeting(issue, meeting, guests)
+                    except Exception as ex:
+                        meeting_errors[issue.key] = ex
+                        continue
+                    scheduled.add(issue.key)
+
+        failed = self.__flush_issue_updates()
+        self.__report(issues_to_schedule, scheduled, failed, meeting_errors)
+
+    # Same as schedule_in_person_reviews except that issues and meetings are fetched concurrently (the meeting sync is
+    # incremental so fetching it when there turn out to be no issues is cheap) and every meeting is updated
+    # concurrently with its issue linked as soon as the meeting update lands
+    async def schedule_in_person_reviews_async(self):
+        google, jira = AsyncGoogleApiClient(self.google_api_client), AsyncJiraApiClient(self.jira_api_client)
+        issues_to_schedule, all_meetings = await asyncio.gather(
+            jira.get_issues_requiring_in_person_review_scheduling(),
+            google.get_in_person_review_meetings(self.horizon_end))
+        meetings = self.__get_available_design_review_meetings(all_meetings)
+
+        assignments = []
+        if len(issues_to_schedule) > 0 and len(meetings) > 0:
+            # busy intervals are fetched in a worker thread and matching is cheap next to the API calls
+            assignments = await asyncio.to_thread(self.__match_issues_to_meetings, issues_to_schedule, meetings)
+        errors = await asyncio.gather(*[self.__assign_issue_to_meeting_async(google, jira, issue, meeting, guests)
+                                        for issue, meeting, guests in assignments])
+
+        meeting_errors = {issue.key: meeting_error for (issue, _, _), (meeting_error, _) in zip(assignments, errors)
+                          if meeting_error is not None}
+        failed = [issue.key for (issue, _, _), (_, link_error) in zip(assignments, errors) if link_error is not None]
+        scheduled = {issue.key for issue, _, _ in assignments if issue.key not in meeting_errors}
+        self.__report(issues_to_schedule, scheduled, failed, meeting_errors)
+
+    # meeting_errors is {issue key: exception} for issues whose meeting could not be updated
+    def __report(self, issues_to_schedule, scheduled, failed, meeting_errors):
+        # Spooled for the next update digest before checking for left over issues so that the meetings we did update
+        # are still reported
+        self.state_store.spool_updates(UpdateType.IN_PERSON_DESIGN_REVIEW_SCHEDULER, self.updated_events)
+
+        errors = []
+        if len(meeting_errors) > 0:
+            errors.append("Failed to update meetings for issues: " + json.dumps(
+                {issue_key: str(error) for issue_key, error in meeting_errors.items()}))
+
+        left_over = [issue.key for issue in issues_to_schedule
+                     if issue.key not in scheduled and issue.key not in meeting_errors]
+        if len(left_over) > 0:
             # We were not able to assign all issues to an upcoming meeting -- this is a signal that we may not be
-            # able to keep up with the current pace of reviews and manual intervention may be necessary
-            # if this is happening consistently we should decide if we can schedule more in person review slots
-            # potentially at overlapping times -- though this would increase complexity of scheduling as we would
-            # need to make sure people are not scheduled for multiple meetings at the same time
-            raise Exception("Not all issues could be scheduled. Issues left over are: " +
-                            json.dumps([issue.key for issue in issues_to_schedule]))
-
-        self.google_api_client.send_email_with_updates(self.updated_events, UpdateType.IN_PERSON_DESIGN_REVIEW_SCHEDULER)
\ No newline at end of file
+            # able to keep up with the current pace of reviews or that guests are not free for any of the open slots
+            # and manual intervention may be necessary. If this is happening consistently we should decide if we can
+            # schedule more in person review slots
+            errors.append("Not all issues could be scheduled. Issues left over are: " + json.dumps(left_over))
+
+        if len(failed) > 0:
+            errors.append("Meetings were updated but failed to link them from issues: " + json.dumps(failed))
+
+        if len(errors) > 0:
+            raise Exception(". ".join(errors))
\ No newline at end of file
@@ -1,5 +1,14 @@
-from jira import JIRA
-from knox import AutoKnox
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from jira import JIRA, JIRAError
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
+
+from api_metrics import ApiMetrics
+from api_response_cache import ApiResponseCache
+from api_transport import RETRYABLE_STATUS_CODES, THROTTLED_STATUS_CODE, RetryingTransport, TokenBucket, \
+    parse_retry_after
 
 
 class JiraApiClient:
@@ -10,60 +19,129 @@ class JiraApiClient:
     KNOX_JIRA_CONSUMER_KEY = 'jira_prod_api_access:consumer_key'
     KNOX_JIRA_PRIVATE_KEY = 'jira_prod_api_access:key_cert'
 
-    ISSUES_REQUIRING_SENIOR_REVIEWER_ASSIGNMENT_JQL = 'project = "Monetization Design Review" ' \
-                                                      'AND status = "In Review" ' \
-                                                      'AND "Senior Reviewer" = EMPTY ' \
-                                                      'AND "Responsible Teams" = M10N-Senior-Review-Poo ' \
-                                                      'AND Checklist is not EMPTY ' \
-                                                      'AND Checklist != M10-Senior-Review-Poo'
-
-    OPEN_ISSUES_BY_FOR_SR_REVIEWER_JQL = 'project = "Monetization Design Review"  ' \
-                                         'AND "Senior Reviewer" = {ldap}  ' \
-                                         'AND status = "In Review"'
-
-    # Its important to apply an order to this query as issues should be assigned review slots in the order they
-    # are created
-    IN_PERSON_DESIGN_REVIEW_REQUESTED_JQL = 'project = "Monetization Design Review" ' \
-                                            'AND labels = "In-Person-M10N-Design-Review-Requested" ' \
-                                            'AND "google calendar meeting" is EMPTY ' \
-                                            'AND status in ("In Review", "In Progress") ' \
-                                            'ORDER BY created ASC'
-
     # Limit response to only fields we need so that we don't send/receive more data than necessary
     SENIOR_REVIEWER_FIELDS_FOR_UPDATE = ['customfield_18441']
-    OPEN_ISSUES_FIELDS = ['id']
     IN_PERSON_DESIGN_REVIEW_FIELDS = ['summary', 'assignee', 'reporter',
                                       'customfield_1841234', 'customfield_16501', 'customfield_16532']
 
-    def __init__(self):
-        self.jira = JIRA(self.JIRA_DOMAIN, oauth={
+    SEARCH_PAGE_SIZE = 100
+    MAX_CONCURRENT_SEARCH_PAGES = 4
+    MAX_CONCURRENT_ISSUE_UPDATES = 8
+    # Jira server rate limits per user -- keep under it and keep enough pooled connections for every worker thread
+    REQUESTS_PER_SECOND = 10
+    MAX_POOLED_CONNECTIONS = max(MAX_CONCURRENT_SEARCH_PAGES, MAX_CONCURRENT_ISSUE_UPDATES)
+
+    # jira is normally created from knox credentials -- it can be passed in instead, e.g. so that benchmark.py can run
+    # this client against a fake Jira
+    def __init__(self, board, cache=None, metrics=None, jira=None):
+        # Board specific queries -- see ReviewBoard
+        self.senior_reviewer_assignment_jql = board.senior_reviewer_assignment_jql
+        self.open_issues_for_sr_reviewers_jql = board.open_issues_for_sr_reviewers_jql
+        self.in_person_design_review_requested_jql = board.in_person_design_review_requested_jql
+        self.cache = cache if cache is not None else ApiResponseCache(board.get_path(ApiResponseCache.CACHE_FILE))
+        self.metrics = metrics if metrics is not None else ApiMetrics(board.data_dir)
+        self.transport = RetryingTransport(TokenBucket(self.REQUESTS_PER_SECOND), self.metrics, self.__get_retry_info)
+        self.jira = jira if jira is not None else self.__create_jira()
+        # The default pool only keeps a few connections alive so concurrent pages and updates would keep reconnecting
+        self.jira._session.mount('https://', HTTPAdapter(pool_maxsize=self.MAX_POOLED_CONNECTIONS))
+
+    def __create_jira(self):
+        # Imported here so that knox is only needed where real credentials are read
+        from knox import AutoKnox
+        # Retries are handled by our transport so that they are rate limited and counted -- turn off the library's own
+        return JIRA(self.JIRA_DOMAIN, max_retries=0, oauth={
             'access_token': AutoKnox(self.KNOX_JIRA_ACCESS_TOKEN).get_primary().strip(),
             'access_token_secret': AutoKnox(self.KNOX_JIRA_ACCESS_TOKEN_SECRET).get_primary().strip(),
             'consumer_key': AutoKnox(self.KNOX_JIRA_CONSUMER_KEY).get_primary().strip(),
             'key_cert': AutoKnox(self.KNOX_JIRA_PRIVATE_KEY).get_primary().strip()
         })
 
+    # Returns (is_retryable, retry_after_in_seconds, is_throttled) for an exception raised by a call
+    @staticmethod
+    def __get_retry_info(ex):
+        if isinstance(ex, JIRAError):
+            is_throttled = ex.status_code == THROTTLED_STATUS_CODE
+            retry_after = ex.response.headers.get('Retry-After') if ex.response is not None else None
+            return ex.status_code in RETRYABLE_STATUS_CODES, parse_retry_after(retry_after), is_throttled
+        if isinstance(ex, (ConnectionError, Timeout)):
+            return True, None, False
+        return False, None, False
+
+    def __search_page(self, jql, fields, start_at):
+        def search():
+            with self.metrics.time_call('jira.search_issues'):
+                # Optimize by only pulling back fields that we need
+                return self.jira.search_issues(jql, fields=", ".join(fields), startAt=start_at,
+                                               maxResults=self.SEARCH_PAGE_SIZE)
+
+        return self.transport.call('jira.search_issues', search)
+
+    # Generator that yields issues in the order returned by the query. The first page tells us how many issues match
+    # so the remaining pages are all requested before anything is yielded and fetched concurrently -- this keeps the
+    # window in which a caller's own updates can shift page offsets as small as possible. Pages are still yielded in
+    # order so that ORDER BY clauses are respected
     def __search_issues(self, jql, fields):
-        issues = []
-        chunk_size = 100
-        while True:
-            # Optimize by only pulling back fields that we need
-            cur = self.jira.search_issues(jql, fields=", ".join(fields), startAt=0, maxResults=100)
-            issues += cur.iterable
-            if chunk_size > cur.total:
-                break
-        return issues
+        first_page = self.__search_page(jql, fields, 0)
+        # Jira caps maxResults at its own limit which can be lower than what we asked for -- step by what it returned
+        page_size = first_page.maxResults or self.SEARCH_PAGE_SIZE
+        remaining_offsets = range(page_size, first_page.total, page_size)
+
+        with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_SEARCH_PAGES) as executor:
+            pages = [executor.submit(self.__search_page, jql, fields, start_at) for start_at in remaining_offsets]
+            try:
+                for issue in first_page:
+                    yield issue
+                for page in pages:
+                    for issue in page.result():
+                        yield issue
+            finally:
+                # If the caller stops consuming early there is no point in fetching the rest
+                for page in pages:
+                    page.cancel()
 
     def get_issues_to_assign(self):
-        return self.__search_issues(self.ISSUES_REQUIRING_SENIOR_REVIEWER_ASSIGNMENT_JQL,
+        return self.__search_issues(self.senior_reviewer_assignment_jql,
                                     self.SENIOR_REVIEWER_FIELDS_FOR_UPDATE)
 
-    def get_open_issues_by_senior_reviewer(self, ldap):
-        return self.__search_issues(self.OPEN_ISSUES_BY_FOR_SR_REVIEWER_JQL.format(ldap=ldap), self.OPEN_ISSUES_FIELDS)
+    # Counts open issues for all senior reviewers with a single search -- only the senior reviewer field is pulled back
+    # and the counts are aggregated in memory. Reviewers with no open issues will not be in the returned counter
+    def get_open_issue_counts_by_senior_reviewer(self, ldaps):
+        if len(ldaps) == 0:
+            return Counter()
+        jql = self.open_issues_for_sr_reviewers_jql.format(ldaps=", ".join('"{}"'.format(ldap) for ldap in ldaps))
+        # customfield_18441 is senior reviewer
+        return Counter(self.cache.get_or_fetch(
+            ApiResponseCache.OPEN_ISSUE_COUNTS, ",".join(sorted(ldaps)),
+            lambda: Counter(issue.fields.customfield_18441.name
+                            for issue in self.__search_issues(jql, self.SENIOR_REVIEWER_FIELDS_FOR_UPDATE)
+                            if issue.fields.customfield_18441 is not None)))
 
     def get_issues_requiring_in_person_review_scheduling(self):
-        return self.__search_issues(self.IN_PERSON_DESIGN_REVIEW_REQUESTED_JQL,
+        return self.__search_issues(self.in_person_design_review_requested_jql,
                                     self.IN_PERSON_DESIGN_REVIEW_FIELDS)
 
+    def __update_issue(self, issue, fields):
+        def update():
+            with self.metrics.time_call('jira.issue.update'):
+                issue.update(fields=fields)
+
+        try:
+            self.transport.call('jira.issue.update', update)
+            return None
+        except Exception as ex:
+            return ex
+
+    # Flushes a batch of (issue, fields) edits concurrently and returns (issue, exception) pairs in the same order --
+    # exception is None if the update succeeded. Jira server has no bulk edit endpoint so each edit is still its own
+    # request but they are no longer made one round trip at a time. Failures are returned rather than raised so that
+    # callers can report exactly which issues were updated
+    def update_issues(self, issue_field_updates):
+        with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_ISSUE_UPDATES) as executor:
+            errors = executor.map(lambda update: self.__update_issue(*update), issue_field_updates)
+            results = [(issue, error) for (issue, _), error in zip(issue_field_updates, errors)]
+        # Edits may have changed who is reviewing what
+        self.cache.invalidate(ApiResponseCache.OPEN_ISSUE_COUNTS)
+        return results
+
     def get_jira_path(self, issue):
         return self.JIRA_BROWSE_PATH.format(jira_domain=self.JIRA_DOMAIN, issue_id=issue.key)
\ No newline at end of file
@@ -0,0 +1,22 @@
+import traceback
+
+from toolbox import UpdateType
+
+
+# Runs one job for a board: takes the job's run lock, starts metrics fresh (clients are shared across runs in daemon
+# mode), pages on failure and writes the run summary. run takes no arguments and does the job's actual work
+def run_job(update_type, google_client, state_store, run):
+    with state_store.run_lock(update_type.value) as acquired:
+        # Another run of the same job is still going -- let it finish rather than making the same updates twice
+        if not acquired:
+            return
+        google_client.metrics.reset()
+        try:
+            run()
+        except Exception as ex:
+            google_client.send_pagerduty_email(ex, traceback.format_exc(), update_type)
+        finally:
+            # Goes out with the job's updates in the next update digest -- the digest itself has nothing to report on
+            if update_type != UpdateType.UPDATE_DIGEST:
+                state_store.record_run_summary(update_type, google_client.metrics.format_summary())
+            google_client.metrics.write_run_summary(update_type.name.lower())
@@ -0,0 +1,79 @@
+import json
+import os
+
+
+class ReviewBoard:
+    # Everything that differs between review boards -- which group reviews, where issues live in Jira, which calendar
+    # holds the in person review meetings and where local state is kept. Boards are listed in review_boards.json and run
+    # by run_review_boards.py -- the single board crons and the daemon load theirs from the same file
+    CONFIG_FILE = 'review_boards.json'
+    DEFAULT_BOARD = 'm10n'
+    REQUIRED_FIELDS = ['name', 'senior_review_group', 'admin_email', 'pagerduty_email',
+                       'senior_reviewer_assignment_jql', 'open_issues_for_sr_reviewers_jql']
+
+    def __init__(self, name, senior_review_group, admin_email, pagerduty_email, senior_reviewer_assignment_jql,
+                 open_issues_for_sr_reviewers_jql, in_person_design_review_requested_jql=None,
+                 in_person_review_calendar=None, in_person_review_summary=None, sr_review_emails_override=None,
+                 reviewer_capacities=None, data_dir=None):
+        self.name = name
+        self.senior_review_group = senior_review_group
+        self.admin_email = admin_email
+        # Failures are paged here so that every board's failures go to the team that owns the board
+        self.pagerduty_email = pagerduty_email
+        self.senior_reviewer_assignment_jql = senior_reviewer_assignment_jql
+        # Formatted with the quoted ldaps of every senior reviewer
+        self.open_issues_for_sr_reviewers_jql = open_issues_for_sr_reviewers_jql
+        # Boards without a calendar don't hold in person reviews. This query should be ordered (e.g. ORDER BY created
+        # ASC) as issues are given review slots in the order it returns them
+        self.in_person_design_review_requested_jql = in_person_design_review_requested_jql
+        self.in_person_review_calendar = in_person_review_calendar
+        self.in_person_review_summary = in_person_review_summary
+        # While set only these reviewers are assigned rather than the whole senior review group
+        self.sr_review_emails_override = sr_review_emails_override or []
+        # {email: max open issues} for senior reviewers -- reviewers who aren't listed have no limit
+        self.reviewer_capacities = reviewer_capacities or {}
+        # State, cache and metrics files for the board are kept here so boards never share local state
+        self.data_dir = data_dir if data_dir is not None else name
+
+    @classmethod
+    def from_config(cls, config):
+        missing = [field for field in cls.REQUIRED_FIELDS if not config.get(field)]
+        if len(missing) > 0:
+            raise ValueError('Review board {} is missing {}'.format(config.get('name'), ', '.join(missing)))
+        if '{ldaps}' not in config['open_issues_for_sr_reviewers_jql']:
+            raise ValueError('Review board {} open_issues_for_sr_reviewers_jql must contain {{ldaps}}'.format(
+                config['name']))
+        # Meetings are found by their summary so without one the board would never find a meeting to schedule into
+        missing_for_in_person_reviews = [field for field in ['in_person_design_review_requested_jql',
+                                                             'in_person_review_summary'] if not config.get(field)]
+        if config.get('in_person_review_calendar') and len(missing_for_in_person_reviews) > 0:
+            raise ValueError('Review board {} has an in person review calendar but is missing {}'.format(
+                config['name'], ', '.join(missing_for_in_person_reviews)))
+        invalid_capacities = [email for email, capacity in (config.get('reviewer_capacities') or {}).items()
+                              if not isinstance(capacity, int) or capacity < 1]
+        if len(invalid_capacities) > 0:
+            raise ValueError('Review board {} has reviewer capacities that are not positive integers for {}'.format(
+                config['name'], ', '.join(invalid_capacities)))
+        return cls(**config)
+
+    @staticmethod
+    def load(config_file=CONFIG_FILE):
+        with open(config_file) as filehandle:
+            boards = [ReviewBoard.from_config(config) for config in json.load(filehandle)['boards']]
+        names = [board.name for board in boards]
+        if len(names) != len(set(names)):
+            raise ValueError('Review board names must be unique')
+        return boards
+
+    @staticmethod
+    def load_board(name=DEFAULT_BOARD, config_file=CONFIG_FILE):
+        boards = [board for board in ReviewBoard.load(config_file) if board.name == name]
+        if len(boards) == 0:
+            raise ValueError('There is no review board named {} in {}'.format(name, config_file))
+        return boards[0]
+
+    def has_in_person_reviews(self):
+        return self.in_person_review_calendar is not None
+
+    def get_path(self, file_name):
+        return os.path.join(self.data_dir, file_name)
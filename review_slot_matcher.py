@@ -0,0 +1,122 @@
+from bisect import bisect_left
+
+
+class ReviewSlotMatcher:
+    # Assigns issues to in person review slots:
+    #   - an issue can only go in a slot where none of its guests are busy
+    #   - two issues that share a guest can't go in slots that overlap in time
+    #   - issues are considered in priority order (created date) and earlier slots are tried first, so the oldest issues
+    #     get the earliest slots they can make, but a later issue can still move an earlier one to another slot if that
+    #     lets both be scheduled (augmenting paths)
+    # This is a heuristic. The shared guest rule makes this harder than plain bipartite matching, so the result never
+    # double books a guest but can schedule fewer issues than the best possible assignment
+
+    def __init__(self, slots, busy_intervals_by_guest):
+        # slots are (start_ts, end_ts) tuples and busy intervals are lists of (start_ts, end_ts) tuples
+        self.slot_order = sorted(range(len(slots)), key=lambda slot: slots[slot])
+        self.slots = slots
+        self.slot_starts = [slots[slot][0] for slot in self.slot_order]
+        self.max_slot_length = max([end - start for start, end in slots], default=0)
+        self.busy_intervals_by_guest = {guest: self.__merge_intervals(intervals)
+                                        for guest, intervals in busy_intervals_by_guest.items()}
+        self.overlapping_slots = self.__get_overlapping_slots()
+
+    @staticmethod
+    def __merge_intervals(intervals):
+        merged = []
+        for start, end in sorted(intervals):
+            if len(merged) > 0 and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def __get_overlapping_slots(self):
+        overlapping_slots = {slot: [] for slot in range(len(self.slots))}
+        # Sweep slots in start order -- we only need to look ahead until a slot starts after the current one ends
+        for position, slot in enumerate(self.slot_order):
+            for other in self.slot_order[position + 1:]:
+                if self.slots[other][0] >= self.slots[slot][1]:
+                    break
+                overlapping_slots[slot].append(other)
+                overlapping_slots[other].append(slot)
+        return overlapping_slots
+
+    def __get_busy_slots(self, guest):
+        # A slot overlaps a busy interval if it starts before the interval ends and ends after it starts -- slots are
+        # sorted by start so only slots starting within one slot length before the interval need to be checked
+        busy_slots = set()
+        for busy_start, busy_end in self.busy_intervals_by_guest.get(guest, []):
+            first = bisect_left(self.slot_starts, busy_start - self.max_slot_length)
+            last = bisect_left(self.slot_starts, busy_end)
+            busy_slots.update(slot for slot in self.slot_order[first:last] if self.slots[slot][1] > busy_start)
+        return busy_slots
+
+    def __conflicts(self, issue, slot, guests_by_issue, issue_by_slot):
+        return any(issue_by_slot.get(other) not in (None, issue)
+                   and not guests_by_issue[issue].isdisjoint(guests_by_issue[issue_by_slot[other]])
+                   for other in self.overlapping_slots[slot])
+
+    def __augment(self, issue, candidate_slots, guests_by_issue, issue_by_slot, slot_by_issue, visited):
+        # Prefer a free slot so that issues already placed (which have higher priority) keep the slots they have and we
+        # only fall back to moving them around when there is no free slot left for this issue
+        for slot in candidate_slots[issue]:
+            if slot not in visited and slot not in issue_by_slot \
+                    and not self.__conflicts(issue, slot, guests_by_issue, issue_by_slot):
+                visited.add(slot)
+                issue_by_slot[slot] = issue
+                slot_by_issue[issue] = slot
+                return True
+        for slot in candidate_slots[issue]:
+            if slot in visited or self.__conflicts(issue, slot, guests_by_issue, issue_by_slot):
+                continue
+            visited.add(slot)
+            current = issue_by_slot.get(slot)
+            if current is None or self.__augment(current, candidate_slots, guests_by_issue, issue_by_slot,
+                                                 slot_by_issue, visited):
+                issue_by_slot[slot] = issue
+                slot_by_issue[issue] = slot
+                return True
+        return False
+
+    def __is_valid(self, issues, guests_by_issue, issue_by_slot, slot_by_issue):
+        return not any(self.__conflicts(issue, slot_by_issue[issue], guests_by_issue, issue_by_slot)
+                       for issue in issues if issue in slot_by_issue)
+
+    # guests_by_issue is a list of guest sets in priority order -- returns a dict of issue index to slot index for every
+    # issue that could be scheduled
+    def match(self, guests_by_issue):
+        guests_by_issue = [set(guests) for guests in guests_by_issue]
+        # Guests show up on many issues so work out which slots each guest is busy for only once
+        busy_slots_by_guest = {guest: self.__get_busy_slots(guest) for guest in set().union(*guests_by_issue)}
+        candidate_slots = []
+        for guests in guests_by_issue:
+            busy_slots = set().union(*[busy_slots_by_guest[guest] for guest in guests])
+            candidate_slots.append([slot for slot in self.slot_order if slot not in busy_slots])
+
+        issue_by_slot = {}
+        slot_by_issue = {}
+        # Slots we failed to find an augmenting path through stay dead until the matching changes -- this keeps the
+        # cost of a long tail of issues that can't be scheduled down to one search
+        visited = set()
+        for issue in range(len(guests_by_issue)):
+            if len(issue_by_slot) == len(self.slots):
+                break
+            snapshot = dict(issue_by_slot), dict(slot_by_issue)
+            if not self.__augment(issue, candidate_slots, guests_by_issue, issue_by_slot, slot_by_issue, visited):
+                continue
+            visited = set()
+            # Issues moved along the augmenting path were checked against the matching as it was before they moved, so
+            # make sure the moves did not put two issues sharing a guest in overlapping slots
+            moved = [other for other, slot in slot_by_issue.items() if snapshot[1].get(other) != slot]
+            if not self.__is_valid(moved, guests_by_issue, issue_by_slot, slot_by_issue):
+                issue_by_slot, slot_by_issue = snapshot
+                self.__place_without_moves(issue, candidate_slots, guests_by_issue, issue_by_slot, slot_by_issue)
+        return slot_by_issue
+
+    def __place_without_moves(self, issue, candidate_slots, guests_by_issue, issue_by_slot, slot_by_issue):
+        for slot in candidate_slots[issue]:
+            if slot not in issue_by_slot and not self.__conflicts(issue, slot, guests_by_issue, issue_by_slot):
+                issue_by_slot[slot] = issue
+                slot_by_issue[issue] = slot
+                return
@@ -0,0 +1,70 @@
+import argparse
+import sys
+from multiprocessing import Process
+from multiprocessing.connection import wait
+
+from assign_senior_reviewer import assign_senior_reviewers
+from board_clients import create_clients
+from review_board import ReviewBoard
+from schedule_in_person_reviews import schedule_in_person_reviews
+from send_update_digest import send_update_digest
+
+# Runs every review board in review_boards.json, each in its own process with its own clients and local state so that
+# boards run in parallel. Every board gets a process of its own rather than a slot in a process pool -- a pool breaks
+# for every board when any one worker dies abruptly (OOM kill, segfault) while a lone process only takes down its board.
+# Within a board assignment runs before in person scheduling. The update digest is left to its own, less frequent,
+# schedule (--digest) so that updates from many runs go out together rather than in an email per run
+
+
+def run_review_board(board, async_mode, digest):
+    google_client, jira_client, state_store = create_clients(board)
+
+    # Jobs send their own pagerduty email on failure -- anything that escapes them (e.g. creating the clients) is
+    # printed by multiprocessing and shows up as a non zero exit code
+    if digest:
+        send_update_digest(google_client, jira_client, state_store)
+        return
+    assign_senior_reviewers(google_client, jira_client, state_store, async_mode)
+    if board.has_in_person_reviews():
+        schedule_in_person_reviews(google_client, jira_client, state_store, async_mode)
+
+
+# Runs each board in its own process with at most max_workers running at once. Returns the names of boards whose
+# process did not exit cleanly
+def run_review_boards(boards, async_mode, max_workers, digest=False):
+    pending = list(boards)
+    running = {}
+    failed = []
+    while len(pending) > 0 or len(running) > 0:
+        while len(pending) > 0 and len(running) < max_workers:
+            board = pending.pop(0)
+            process = Process(target=run_review_board, args=(board, async_mode, digest), name=board.name)
+            process.start()
+            running[process.sentinel] = (board, process)
+        for sentinel in wait(list(running)):
+            board, process = running.pop(sentinel)
+            process.join()
+            if process.exitcode != 0:
+                failed.append(board.name)
+                print('Review board {} failed with exit code {}'.format(board.name, process.exitcode), file=sys.stderr)
+    return failed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Runs the design review crons for every configured review board')
+    parser.add_argument('--config', default=ReviewBoard.CONFIG_FILE, help='Review board config file')
+    parser.add_argument('--boards', nargs='+', help='Only run these boards')
+    parser.add_argument('--max-workers', type=int, help='Max boards run at once -- defaults to all of them')
+    parser.add_argument('--async-mode', action='store_true', help='Run independent API calls concurrently')
+    parser.add_argument('--digest', action='store_true',
+                        help='Only send the update digest for each board -- run on its own, less frequent, schedule')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    boards = [board for board in ReviewBoard.load(args.config) if args.boards is None or board.name in args.boards]
+    # Boards spend nearly all their time waiting on APIs so by default every board runs at once
+    failed = run_review_boards(boards, args.async_mode, args.max_workers or max(1, len(boards)), args.digest)
+    if len(failed) > 0:
+        sys.exit('Review boards failed: ' + ', '.join(failed))
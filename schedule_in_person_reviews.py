@@ -1,18 +1,28 @@
-import traceback
+import argparse
+import asyncio
 
-from google_api_client import GoogleApiClient
+from board_clients import create_clients
 from in_person_design_review_scheduler import InPersonDesignReviewSchedulingTool
-from jira_api_client import JiraApiClient
+from job_runner import run_job
+from review_board import ReviewBoard
 from toolbox import UpdateType
 
-google_client = GoogleApiClient()
-jira_client = JiraApiClient()
 
+def schedule_in_person_reviews(google_client, jira_client, state_store, async_mode=False):
+    def schedule():
+        tool = InPersonDesignReviewSchedulingTool(google_client, jira_client, state_store)
+        if async_mode:
+            asyncio.run(tool.schedule_in_person_reviews_async())
+        else:
+            tool.schedule_in_person_reviews()
 
-try:
-    InPersonDesignReviewSchedulingTool(google_client, jira_client).schedule_in_person_reviews()
-except Exception as ex:
-    # This is not entirely safe as a failure while creating the google or jira client would throw errors not
-    # caught -- however the cron email will catch these errors and its still worth sending a more descriptive
-    # error here if possible
-    google_client.send_pagerduty_email(ex, traceback.format_exc(), UpdateType.IN_PERSON_DESIGN_REVIEW_SCHEDULER)
\ No newline at end of file
+    run_job(UpdateType.IN_PERSON_DESIGN_REVIEW_SCHEDULER, google_client, state_store, schedule)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Schedules in person design reviews into open review meetings')
+    parser.add_argument('--board', default=ReviewBoard.DEFAULT_BOARD, help='Review board in the config file to run')
+    parser.add_argument('--config', default=ReviewBoard.CONFIG_FILE, help='Review board config file')
+    parser.add_argument('--async-mode', action='store_true', help='Run independent API calls concurrently')
+    args = parser.parse_args()
+    schedule_in_person_reviews(*create_clients(ReviewBoard.load_board(args.board, args.config)), args.async_mode)
@@ -0,0 +1,68 @@
+import argparse
+import sched
+import sys
+import time
+import traceback
+from functools import partial
+
+from assign_senior_reviewer import assign_senior_reviewers
+from board_clients import create_clients
+from review_board import ReviewBoard
+from schedule_in_person_reviews import schedule_in_person_reviews
+from send_update_digest import send_update_digest
+
+# Keeps one warm google client and one warm jira client alive and runs both tools on an interval -- this avoids paying
+# for imports, knox reads, OAuth and discovery document builds on every run as we do with the cron scripts
+DEFAULT_SENIOR_REVIEWER_ASSIGNMENT_INTERVAL_IN_SECONDS = 5 * 60
+DEFAULT_IN_PERSON_REVIEW_SCHEDULING_INTERVAL_IN_SECONDS = 15 * 60
+# Updates from both jobs are spooled and emailed together at this interval so inbox noise follows activity
+DEFAULT_UPDATE_DIGEST_INTERVAL_IN_SECONDS = 60 * 60
+
+
+def run_job(scheduler, interval_in_seconds, job, google_client, jira_client, state_store):
+    # Schedule the next run before running this one so that interval is measured from start to start and a slow run
+    # delays the next one rather than skipping it
+    scheduler.enter(interval_in_seconds, 0, run_job,
+                    (scheduler, interval_in_seconds, job, google_client, jira_client, state_store))
+    try:
+        # Refresh here rather than letting each worker thread notice an expired token mid-batch
+        google_client.refresh_credentials_if_expired()
+        # Jobs send their own pagerduty email on failure but sending it, taking the run lock or writing the run summary
+        # can still raise -- under cron that would only cost one run so it must not take down the daemon either
+        job(google_client, jira_client, state_store)
+    except Exception:
+        print('Job {} failed:\n{}'.format(getattr(job, '__name__', job), traceback.format_exc()), file=sys.stderr)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Runs design review crons as a long lived process')
+    parser.add_argument('--board', default=ReviewBoard.DEFAULT_BOARD, help='Review board in the config file to run')
+    parser.add_argument('--config', default=ReviewBoard.CONFIG_FILE, help='Review board config file')
+    parser.add_argument('--senior-reviewer-assignment-interval', type=int,
+                        default=DEFAULT_SENIOR_REVIEWER_ASSIGNMENT_INTERVAL_IN_SECONDS,
+                        help='Seconds between senior reviewer assignment runs')
+    parser.add_argument('--in-person-review-scheduling-interval', type=int,
+                        default=DEFAULT_IN_PERSON_REVIEW_SCHEDULING_INTERVAL_IN_SECONDS,
+                        help='Seconds between in person design review scheduling runs')
+    parser.add_argument('--async-mode', action='store_true',
+                        help='Run independent API calls within each job concurrently')
+    parser.add_argument('--update-digest-interval', type=int, default=DEFAULT_UPDATE_DIGEST_INTERVAL_IN_SECONDS,
+                        help='Seconds between update digest emails')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    google_client, jira_client, state_store = create_clients(ReviewBoard.load_board(args.board, args.config))
+
+    scheduler = sched.scheduler(time.monotonic, time.sleep)
+    scheduler.enter(0, 0, run_job, (scheduler, args.senior_reviewer_assignment_interval,
+                                    partial(assign_senior_reviewers, async_mode=args.async_mode),
+                                    google_client, jira_client, state_store))
+    scheduler.enter(0, 1, run_job, (scheduler, args.in_person_review_scheduling_interval,
+                                    partial(schedule_in_person_reviews, async_mode=args.async_mode),
+                                    google_client, jira_client, state_store))
+    # Runs after both jobs so the first digest picks up their updates
+    scheduler.enter(0, 2, run_job, (scheduler, args.update_digest_interval, send_update_digest,
+                                    google_client, jira_client, state_store))
+    scheduler.run()
@@ -0,0 +1,21 @@
+import argparse
+
+from board_clients import create_clients
+from job_runner import run_job
+from review_board import ReviewBoard
+from toolbox import UpdateType
+from update_digest_tool import UpdateDigestTool
+
+
+# jira_client is unused but taken so that every job has the same signature for the scheduler daemon
+def send_update_digest(google_client, jira_client, state_store):
+    run_job(UpdateType.UPDATE_DIGEST, google_client, state_store,
+            lambda: UpdateDigestTool(google_client, state_store).send_update_digest())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Emails the updates spooled by the other jobs since the last digest')
+    parser.add_argument('--board', default=ReviewBoard.DEFAULT_BOARD, help='Review board in the config file to run')
+    parser.add_argument('--config', default=ReviewBoard.CONFIG_FILE, help='Review board config file')
+    args = parser.parse_args()
+    send_update_digest(*create_clients(ReviewBoard.load_board(args.board, args.config)))
@@ -1,29 +1,42 @@
-import pickle
-from collections import deque
+import asyncio
+import heapq
+import json
+from datetime import datetime, timezone
 
-from toolbox import UpdateType, Reviewer
+from async_api_clients import AsyncGoogleApiClient, AsyncJiraApiClient
+from state_store import StateStore
+from toolbox import UpdateType, UpdateStatus, Reviewer
 
 
 class SeniorReviewQueueTool:
-    def __init__(self, sr_review_emails, availability, jira_api_client):
+    def __init__(self, sr_review_emails, days_available, jira_api_client, state_store, open_issue_counts=None,
+                 reviewer_capacities=None):
         self.sr_review_emails = sr_review_emails
-        self.availability = availability
+        self.days_available = days_available
         self.jira_api_client = jira_api_client
+        self.state_store = state_store
+        # Can be passed in when it has already been fetched -- see SeniorReviewAssignmentTool.create_async
+        self.open_issue_counts = open_issue_counts
+        # {email: max open issues} -- see ReviewBoard
+        self.reviewer_capacities = reviewer_capacities or {}
 
     def __get_queue_at_last_update(self):
-        with open('reviewer_queue_saved_state.data', 'rb') as filehandle:
-            # read the data as binary data stream
-            queue = pickle.load(filehandle)
-        return queue
-
-    def __generate_queue_by_count_issues_assigned(self):
-        count_issues_assigned_by_email = {
-            email:  len(self.jira_api_client.get_open_issues_by_senior_reviewer(
-                Reviewer.get_ldap_from_pinterest_email(email)))
-            for email in self.sr_review_emails
-        }
-        return sorted([email for email in self.sr_review_emails],
-                      key=lambda email: count_issues_assigned_by_email.get(email))
+        return self.state_store.get_reviewer_queue()
+
+    def __get_open_issue_counts(self):
+        if self.open_issue_counts is not None:
+            return self.open_issue_counts
+        try:
+            return self.jira_api_client.get_open_issue_counts_by_senior_reviewer(
+                [Reviewer.get_ldap_from_pinterest_email(email) for email in self.sr_review_emails])
+        except Exception:
+            # If we cannot count open issues for any reason fall back to the order of the queue alone
+            return {}
+
+    def __reconcile_with_roster(self, queue_at_last_update):
+        queued = set(queue_at_last_update)
+        missing_from_queue = [email for email in self.sr_review_emails if email not in queued]
+        return missing_from_queue + queue_at_last_update
 
     def get_or_generate_reviewer_queue(self):
         try:
@@ -32,64 +45,146 @@ class SeniorReviewQueueTool:
             # If we cannot read previous state set queue to empty
             queue_at_last_update = []
 
-        # If queue is empty either because we could not read previous state or because this is the first run
-        # we should create a queue by count of issues assigned descending so that the people who have the least
-        # issues currently assigned to them get assigned issues first
-        if len(queue_at_last_update) == 0:
-            try:
-                queue_at_last_update = self.__generate_queue_by_count_issues_assigned()
-            except Exception:
-                #  If we cannot generate a queue by count issues assigned for any reason start with empty list
-                queue_at_last_update = []
-
-        missing_from_queue = [email for email in self.sr_review_emails if email not in queue_at_last_update]
-
-        # return a queue of emails to assign -- note that we could use a list however dequeue guarantees O(1) perf
-        return deque([Reviewer(email, self.availability[email])
-                      for email in missing_from_queue + queue_at_last_update
-                      if email in self.availability.keys()])
+        # New reviewers go to the front of the queue. The queue order is only used to break ties -- reviewers are
+        # picked by their live open issue count first (see SeniorReviewAssignmentTool) so a lost queue no longer needs
+        # to be regenerated
+        queue = [email for email in self.__reconcile_with_roster(queue_at_last_update) if email in self.days_available]
+
+        count_issues_assigned_by_ldap = self.__get_open_issue_counts()
+        reviewers = []
+        for position, email in enumerate(queue):
+            ldap = Reviewer.get_ldap_from_pinterest_email(email)
+            days_available = self.days_available[email]
+            reviewers.append(Reviewer(email,
+                                      days_available >= SeniorReviewAssignmentTool.MIN_DAYS_AVAILABLE_FOR_ASSIGNMENT,
+                                      days_available=days_available,
+                                      open_issue_count=count_issues_assigned_by_ldap.get(ldap, 0),
+                                      capacity=self.reviewer_capacities.get(
+                                          email, SeniorReviewAssignmentTool.DEFAULT_REVIEWER_CAPACITY),
+                                      queue_position=position))
+        return reviewers
 
 
 class SeniorReviewAssignmentTool:
-    # TODO update calendar funcs to use business days and change this to 5
-    REVIEW_SLA_IN_DAYS = 7
-    MIN_DAYS_AVAILABLE_FOR_ASSIGNMENT = 4
-
-    def __init__(self, google_api_client, jira_api_client):
+    # Both in business days
+    REVIEW_SLA_IN_DAYS = 5
+    MIN_DAYS_AVAILABLE_FOR_ASSIGNMENT = 3
+    LAST_RUN_CURSOR = 'senior_reviewer_assignment:last_run'
+    # Max open issues a reviewer should be assigned at once unless the board sets one for them -- None is no limit
+    DEFAULT_REVIEWER_CAPACITY = None
+
+    # Anything not passed in is fetched one call after another -- use create_async to fetch it all concurrently
+    def __init__(self, google_api_client, jira_api_client, state_store=None, issues_to_assign=None,
+                 sr_review_members=None, days_available=None, open_issue_counts=None):
         self.google_api_client = google_api_client
         self.jira_api_client = jira_api_client
-        self.issues_to_assign = jira_api_client.get_issues_to_assign()
-
-        sr_review_emails = google_api_client.get_sr_review_emails()
-        availability = google_api_client.get_availability(sr_review_emails)
-        self.reviewer_queue = SeniorReviewQueueTool(sr_review_emails, availability, jira_api_client).get_or_generate_reviewer_queue()
-
-        self.skipped = []
-
+        self.state_store = state_store if state_store is not None else StateStore()
+        self.issues_to_assign = issues_to_assign if issues_to_assign is not None \
+            else jira_api_client.get_issues_to_assign()
+
+        if sr_review_members is None:
+            sr_review_members = google_api_client.get_sr_review_members()
+        sr_review_emails = [member['email'] for member in sr_review_members]
+        if days_available is None:
+            days_available = google_api_client.get_days_available(sr_review_emails)
+        self.reviewers = SeniorReviewQueueTool(sr_review_emails, days_available, jira_api_client, self.state_store,
+                                               open_issue_counts,
+                                               google_api_client.reviewer_capacities).get_or_generate_reviewer_queue()
+
+        # Min heap of available reviewers ordered by load, then by most days available within the SLA and finally by
+        # position in the queue so that reviewers with the same load are still assigned round robin
+        self.reviewer_heap = [self.__get_heap_entry(reviewer) for reviewer in self.reviewers if reviewer.is_available]
+        heapq.heapify(self.reviewer_heap)
+        self.next_queue_position = len(self.reviewers)
+
+    # Builds the tool with every independent fetch running concurrently -- the issues to assign are fetched alongside
+    # the reviewers and once the reviewers are known their availability and open issue counts are fetched together
+    @classmethod
+    async def create_async(cls, google_api_client, jira_api_client, state_store=None):
+        google, jira = AsyncGoogleApiClient(google_api_client), AsyncJiraApiClient(jira_api_client)
+
+        async def get_open_issue_counts(sr_review_emails):
+            try:
+                return await jira.get_open_issue_counts_by_senior_reviewer(
+                    [Reviewer.get_ldap_from_pinterest_email(email) for email in sr_review_emails])
+            except Exception:
+                # Same fallback as SeniorReviewQueueTool -- order by the queue alone
+                return {}
+
+        async def get_reviewer_data():
+            sr_review_members = await google.get_sr_review_members()
+            sr_review_emails = [member['email'] for member in sr_review_members]
+            days_available, open_issue_counts = await asyncio.gather(google.get_days_available(sr_review_emails),
+                                                                     get_open_issue_counts(sr_review_emails))
+            return sr_review_members, days_available, open_issue_counts
+
+        issues_to_assign, (sr_review_members, days_available, open_issue_counts) = await asyncio.gather(
+            jira.get_issues_to_assign(), get_reviewer_data())
+        return cls(google_api_client, jira_api_client, state_store, issues_to_assign=issues_to_assign,
+                   sr_review_members=sr_review_members, days_available=days_available,
+                   open_issue_counts=open_issue_counts)
+
+    @staticmethod
+    def __get_heap_entry(reviewer):
+        # Reviewers at capacity always sort last -- loads of reviewers with and without a capacity aren't on the same
+        # scale so load alone can't tell us whether anyone still has room. queue positions are unique so reviewers
+        # themselves are never compared
+        return not reviewer.has_capacity(), reviewer.get_load(), -reviewer.days_available, reviewer.queue_position, \
+            reviewer
+
+    # Returns None once every available reviewer is at capacity
     def __get_first_available_reviewer(self):
-        reviewer = None
-        while len(self.reviewer_queue) > 0 and (reviewer is None or not reviewer.is_available):
-            reviewer = self.reviewer_queue.popleft()
-            if reviewer.is_available:
-                return reviewer
-            else:
-                self.skipped.append(reviewer)
-        raise Exception("No Available Senior Reviewers")
-
-    def __save_queue_to_file(self):
-        # Saving state of the queue. All people who were skipped should be at top of queue next time
-        queue = [reviewer.email for reviewer in self.skipped] + [reviewer.email for reviewer in self.reviewer_queue]
-        with open('reviewer_queue_saved_state.data', 'wb') as filehandle:
-            # store the data as binary data stream
-            pickle.dump(queue, filehandle)
+        if len(self.reviewer_heap) == 0 or not self.reviewer_heap[0][-1].has_capacity():
+            return None
+        return heapq.heappop(self.reviewer_heap)[-1]
+
+    def __return_reviewer_after_assignment(self, reviewer):
+        # Assigned reviewers move to the back of the queue among reviewers with the same load
+        reviewer.open_issue_count += 1
+        reviewer.queue_position = self.next_queue_position
+        self.next_queue_position += 1
+        heapq.heappush(self.reviewer_heap, self.__get_heap_entry(reviewer))
+
+    def __save_queue(self):
+        # Saving state of the queue. Unavailable reviewers keep their place so they are near the top of queue next time
+        self.state_store.save_reviewer_queue(
+            [reviewer.email for reviewer in sorted(self.reviewers, key=lambda reviewer: reviewer.queue_position)])
 
     def assign_sr_reviewers_to_open_tickets(self):
-        updates = []
+        # Compute every assignment in memory first and only then write to Jira -- this way the search results can't
+        # shift underneath us while we are still paging through them and the writes can be flushed concurrently
+        assignments = []
+        left_over = []
         for issue in self.issues_to_assign:
-            reviewer = self.__get_first_available_reviewer()
-            # customfield_18441 is senior reviewer
-            issue.update(customfield_18441={'name': reviewer.ldap})
-            updates.append({'issue': issue.key, 'field': 'SR_REVIEWER', 'value': reviewer.ldap})
-            self.reviewer_queue.append(reviewer)
-        self.__save_queue_to_file()
-        self.google_api_client.send_email_with_updates(updates, UpdateType.SENIOR_REVIEWER_ASSIGNMENT)
+            reviewer = self.__get_first_available_reviewer() if len(left_over) == 0 else None
+            if reviewer is None:
+                # Keep what we could assign and report the rest rather than assigning nothing
+                left_over.append(issue.key)
+                continue
+            assignments.append((issue, reviewer))
+            self.__return_reviewer_after_assignment(reviewer)
+        self.__save_queue()
+
+        reviewer_by_issue_key = {issue.key: reviewer for issue, reviewer in assignments}
+        # customfield_18441 is senior reviewer
+        results = self.jira_api_client.update_issues(
+            [(issue, {'customfield_18441': {'name': reviewer.ldap}}) for issue, reviewer in assignments])
+
+        updates = [{'issue': issue.key, 'field': 'SR_REVIEWER', 'value': reviewer_by_issue_key[issue.key].ldap,
+                    'status': UpdateStatus.describe(error)}
+                   for issue, error in results]
+        self.state_store.record_assignments([(update['issue'], reviewer_by_issue_key[update['issue']].email,
+                                              update['status']) for update in updates])
+        self.state_store.set_cursor(self.LAST_RUN_CURSOR, datetime.now(timezone.utc).isoformat())
+        # Sent out with the next update digest rather than emailed on every run
+        self.state_store.spool_updates(UpdateType.SENIOR_REVIEWER_ASSIGNMENT, updates)
+
+        failed = [issue.key for issue, error in results if error is not None]
+        errors = []
+        if len(failed) > 0:
+            errors.append("Failed to assign senior reviewers to issues: " + json.dumps(failed))
+        if len(left_over) > 0:
+            # Every available reviewer is at capacity -- a signal that we need more reviewers or higher capacities
+            errors.append("No Available Senior Reviewers for issues: " + json.dumps(left_over))
+        if len(errors) > 0:
+            raise Exception(". ".join(errors))
@@ -0,0 +1,150 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+class StateStore:
+    STATE_FILE = 'design_review_state.db'
+    # How long to wait on another process holding a write lock before giving up
+    BUSY_TIMEOUT_IN_SECONDS = 30
+    # A run lock older than this is assumed to belong to a run that crashed
+    RUN_LOCK_TTL_IN_SECONDS = 60 * 60
+
+    def __init__(self, state_file=STATE_FILE):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(state_file, timeout=self.BUSY_TIMEOUT_IN_SECONDS, check_same_thread=False,
+                                          isolation_level=None)
+        # WAL lets overlapping runs read while another one writes and every write is atomic and durable
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS reviewer_queue ('
+                                'position INTEGER PRIMARY KEY, '
+                                'email TEXT NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS assignment_history ('
+                                'issue_key TEXT NOT NULL, '
+                                'reviewer_email TEXT NOT NULL, '
+                                'status TEXT NOT NULL, '
+                                'assigned_at REAL NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS assignment_history_by_issue '
+                                'ON assignment_history (issue_key)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS cursors ('
+                                'name TEXT PRIMARY KEY, '
+                                'value TEXT NOT NULL, '
+                                'updated_at REAL NOT NULL)')
+        # Group snapshots are no longer kept -- the queue is reconciled with the live roster on every run
+        self.connection.execute('DROP TABLE IF EXISTS group_members')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS update_spool ('
+                                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                                'update_type TEXT NOT NULL, '
+                                'update_json TEXT NOT NULL, '
+                                'spooled_at REAL NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS run_summaries ('
+                                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                                'update_type TEXT NOT NULL, '
+                                'summary TEXT NOT NULL, '
+                                'recorded_at REAL NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS run_locks ('
+                                'name TEXT PRIMARY KEY, '
+                                'owner TEXT NOT NULL, '
+                                'expires_at REAL NOT NULL)')
+        self.owner = '{}:{}'.format(os.getpid(), uuid.uuid4().hex)
+
+    @contextmanager
+    def __transaction(self):
+        with self.lock:
+            # BEGIN IMMEDIATE takes the write lock up front so that read-modify-write sequences can't interleave with
+            # another process
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.connection
+                self.connection.execute('COMMIT')
+            except Exception:
+                self.connection.execute('ROLLBACK')
+                raise
+
+    def get_reviewer_queue(self):
+        with self.lock:
+            return [row[0] for row in self.connection.execute('SELECT email FROM reviewer_queue ORDER BY position')]
+
+    # Replaces the whole queue in one transaction so readers see either the old queue or the new one
+    def save_reviewer_queue(self, emails):
+        with self.__transaction() as connection:
+            connection.execute('DELETE FROM reviewer_queue')
+            connection.executemany('INSERT INTO reviewer_queue VALUES (?, ?)', enumerate(emails))
+
+    # assignments are (issue_key, reviewer_email, status) tuples
+    def record_assignments(self, assignments):
+        now = time.time()
+        with self.__transaction() as connection:
+            connection.executemany('INSERT INTO assignment_history VALUES (?, ?, ?, ?)',
+                                   [(issue_key, email, status, now) for issue_key, email, status in assignments])
+
+    def get_assignment_history(self, issue_key):
+        with self.lock:
+            return self.connection.execute('SELECT reviewer_email, status, assigned_at FROM assignment_history '
+                                           'WHERE issue_key = ? ORDER BY assigned_at', (issue_key,)).fetchall()
+
+    def get_cursor(self, name):
+        with self.lock:
+            row = self.connection.execute('SELECT value FROM cursors WHERE name = ?', (name,)).fetchone()
+        return row[0] if row is not None else None
+
+    def set_cursor(self, name, value):
+        with self.__transaction() as connection:
+            connection.execute('INSERT OR REPLACE INTO cursors VALUES (?, ?, ?)', (name, value, time.time()))
+
+    # Updates are buffered here by both tools and sent out together in the next digest email
+    def spool_updates(self, update_type, updates):
+        now = time.time()
+        with self.__transaction() as connection:
+            connection.executemany('INSERT INTO update_spool (update_type, update_json, spooled_at) VALUES (?, ?, ?)',
+                                   [(update_type.value, json.dumps(update), now) for update in updates])
+
+    # Returns (id, update_type value, update, spooled_at) tuples in the order they were spooled
+    def get_spooled_updates(self):
+        with self.lock:
+            rows = self.connection.execute('SELECT id, update_type, update_json, spooled_at FROM update_spool '
+                                           'ORDER BY id').fetchall()
+        return [(row_id, update_type, json.loads(update_json), spooled_at)
+                for row_id, update_type, update_json, spooled_at in rows]
+
+    # Called once updates have been sent so that they are not sent again
+    def delete_spooled_updates(self, ids):
+        with self.__transaction() as connection:
+            connection.executemany('DELETE FROM update_spool WHERE id = ?', [(row_id,) for row_id in ids])
+
+    # The API call summary of every run is kept until the next digest so that it can go out with the run's updates
+    def record_run_summary(self, update_type, summary):
+        with self.__transaction() as connection:
+            connection.execute('INSERT INTO run_summaries (update_type, summary, recorded_at) VALUES (?, ?, ?)',
+                               (update_type.value, summary, time.time()))
+
+    # Returns (id, update_type value, summary, recorded_at) tuples in the order runs finished
+    def get_run_summaries(self):
+        with self.lock:
+            return self.connection.execute('SELECT id, update_type, summary, recorded_at FROM run_summaries '
+                                           'ORDER BY id').fetchall()
+
+    def delete_run_summaries(self, ids):
+        with self.__transaction() as connection:
+            connection.executemany('DELETE FROM run_summaries WHERE id = ?', [(row_id,) for row_id in ids])
+
+    # Yields True if this process now holds the named lock and False if another run already holds it -- used so that
+    # overlapping cron or daemon runs of the same job skip rather than double assign
+    @contextmanager
+    def run_lock(self, name, ttl_in_seconds=RUN_LOCK_TTL_IN_SECONDS):
+        now = time.time()
+        with self.__transaction() as connection:
+            connection.execute('DELETE FROM run_locks WHERE name = ? AND expires_at <= ?', (name, now))
+            acquired = connection.execute('INSERT OR IGNORE INTO run_locks VALUES (?, ?, ?)',
+                                          (name, self.owner, now + ttl_in_seconds)).rowcount == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with self.__transaction() as connection:
+                    connection.execute('DELETE FROM run_locks WHERE name = ? AND owner = ?', (name, self.owner))
@@ -0,0 +1,44 @@
+from datetime import date
+
+import pytest
+
+from business_day_calendar import BusinessDayCalendar
+
+# Thanksgiving 2025 is Thursday November 27
+CALENDAR = BusinessDayCalendar('US', first_year=2025, last_year=2026)
+
+
+def test_weekends_and_holidays_are_not_business_days():
+    assert CALENDAR.is_business_day(date(2025, 11, 26))
+    assert not CALENDAR.is_business_day(date(2025, 11, 27))
+    assert not CALENDAR.is_business_day(date(2025, 11, 29))
+
+
+@pytest.mark.parametrize('count, expected', [
+    (0, date(2025, 11, 26)),
+    (1, date(2025, 11, 28)),
+    (2, date(2025, 12, 1)),
+    (5, date(2025, 12, 4)),
+])
+def test_get_x_business_days_from_skips_thanksgiving_and_the_weekend(count, expected):
+    assert CALENDAR.get_x_business_days_from(date(2025, 11, 26), count) == expected
+
+
+def test_get_x_business_days_from_a_holiday_starts_at_the_next_business_day():
+    assert CALENDAR.get_x_business_days_from(date(2025, 11, 27), 1) == date(2025, 11, 28)
+
+
+@pytest.mark.parametrize('start, end, expected', [
+    (date(2025, 11, 26), date(2025, 11, 26), 0),
+    (date(2025, 11, 26), date(2025, 12, 1), 2),
+    (date(2025, 11, 21), date(2025, 11, 24), 1),
+    (date(2025, 11, 24), date(2025, 12, 5), 8),
+    (date(2025, 12, 1), date(2025, 11, 26), 0),
+])
+def test_count_business_days_between(start, end, expected):
+    assert CALENDAR.count_business_days_between(start, end) == expected
+
+
+def test_dates_outside_of_the_calendar_raise():
+    with pytest.raises(ValueError):
+        CALENDAR.is_business_day(date(2030, 1, 2))
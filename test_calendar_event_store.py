@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+
+from calendar_event_store import CalendarEventStore
+
+CALENDAR = 'calendar@example.com'
+
+
+def create_event(event_id, start, summary='In person design review'):
+    return {'id': event_id, 'summary': summary, 'description': '',
+            'start': {'dateTime': start.isoformat()}, 'end': {'dateTime': (start + timedelta(hours=1)).isoformat()}}
+
+
+def test_past_events_are_dropped_when_changes_are_applied(tmp_path):
+    store = CalendarEventStore(str(tmp_path / CalendarEventStore.STORE_FILE))
+    now = datetime.now(timezone.utc)
+    store.apply_changes(CALENDAR, [create_event('past', now - timedelta(days=1)),
+                                   create_event('upcoming', now + timedelta(days=1))], 'token')
+
+    assert store.connection.execute('SELECT event_id FROM events').fetchall() == [('upcoming',)]
+    assert store.get_sync_token(CALENDAR) == 'token'
+
+
+def test_cancelled_events_are_removed_and_others_are_upserted(tmp_path):
+    store = CalendarEventStore(str(tmp_path / CalendarEventStore.STORE_FILE))
+    now = datetime.now(timezone.utc)
+    store.apply_changes(CALENDAR, [create_event('first', now + timedelta(days=1)),
+                                   create_event('second', now + timedelta(days=2))])
+
+    store.apply_changes(CALENDAR, [{'id': 'first', 'status': CalendarEventStore.CANCELLED_STATUS},
+                                   create_event('second', now + timedelta(days=2), summary='Moved review')])
+
+    events = store.get_events(CALENDAR, now)
+    assert [(event['id'], event['summary']) for event in events] == [('second', 'Moved review')]
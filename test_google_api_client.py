@@ -0,0 +1,59 @@
+import socket
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from fake_api_clients import FakeBackend, create_fake_clients, get_fake_review_board
+from toolbox import UpdateType
+
+
+class FlakyMailService:
+    # Fails the first sends with the given errors and accepts every send after that
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.attempts = 0
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def send(self, userId, body):
+        return self
+
+    def execute(self, http=None):
+        self.attempts += 1
+        if len(self.errors) > 0:
+            raise self.errors.pop(0)
+        return {'id': 'message'}
+
+
+def create_google_client(tmp_path, mail_service):
+    google_client, _, _ = create_fake_clients(FakeBackend(), get_fake_review_board(str(tmp_path)), 2, 0,
+                                              rate_limited=False)
+    google_client.mail_service = mail_service
+    return google_client
+
+
+def create_http_error(status):
+    return HttpError(httplib2.Response({'status': status}), b'')
+
+
+@pytest.mark.parametrize('error', [socket.timeout('timed out'), ConnectionResetError(), create_http_error(504)])
+def test_sends_are_not_retried_when_they_may_have_gone_through(tmp_path, error):
+    mail_service = FlakyMailService([error])
+    google_client = create_google_client(tmp_path, mail_service)
+
+    with pytest.raises(type(error)):
+        google_client.send_pagerduty_email(Exception('error'), 'stacktrace', UpdateType.UPDATE_DIGEST)
+    assert mail_service.attempts == 1
+
+
+def test_sends_are_retried_when_gmail_rejects_them(tmp_path):
+    mail_service = FlakyMailService([create_http_error(503)])
+    google_client = create_google_client(tmp_path, mail_service)
+
+    google_client.send_pagerduty_email(Exception('error'), 'stacktrace', UpdateType.UPDATE_DIGEST)
+    assert mail_service.attempts == 2
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from fake_api_clients import FakeBackend, FakeRequest, create_fake_clients, get_fake_review_board
+from in_person_design_review_scheduler import InPersonDesignReviewSchedulingTool
+from toolbox import UpdateType
+
+COUNT_ISSUES = 5
+
+
+def fail_one_meeting_patch(calendar_service, backend):
+    # The second meeting update is rejected for good (not retried) and every other one goes through
+    patch = calendar_service.patch
+    lock = threading.Lock()
+    count_patches = [0]
+
+    def reject():
+        raise HttpError(httplib2.Response({'status': 400}), b'Rejected')
+
+    def patch_or_fail(calendarId, eventId, body):
+        with lock:
+            count_patches[0] += 1
+            should_fail = count_patches[0] == 2
+        return FakeRequest(backend, 'calendar.events.patch', reject) if should_fail \
+            else patch(calendarId, eventId, body)
+
+    calendar_service.patch = patch_or_fail
+
+
+def create_tool(tmp_path):
+    backend = FakeBackend()
+    google_client, jira_client, state_store = create_fake_clients(
+        backend, get_fake_review_board(str(tmp_path)), 10, COUNT_ISSUES, count_meetings=2 * COUNT_ISSUES,
+        rate_limited=False)
+    fail_one_meeting_patch(google_client.calendar_service, backend)
+    tool = InPersonDesignReviewSchedulingTool(google_client, jira_client, state_store, scheduling_horizon_in_days=3)
+    return tool, jira_client, state_store
+
+
+def check_other_meetings_are_linked_and_reported(error, jira_client, state_store):
+    linked = [issue.key for issue in jira_client.jira.issues if issue.fields.customfield_18402 is not None]
+    not_linked = [issue.key for issue in jira_client.jira.issues if issue.fields.customfield_18402 is None]
+    assert len(linked) == COUNT_ISSUES - 1
+    assert 'Failed to update meetings for issues: {"' + not_linked[0] + '"' in str(error.value)
+    assert 'Rejected' in str(error.value)
+    assert 'left over' not in str(error.value)
+    assert 'failed to link' not in str(error.value)
+    spooled = [update for _, update_type, update, _ in state_store.get_spooled_updates()
+               if update_type == UpdateType.IN_PERSON_DESIGN_REVIEW_SCHEDULER.value]
+    assert sorted(update['issue'] for update in spooled) == sorted(linked)
+
+
+def test_meetings_updated_before_a_failed_meeting_update_are_still_linked(tmp_path):
+    tool, jira_client, state_store = create_tool(tmp_path)
+
+    with pytest.raises(Exception) as error:
+        tool.schedule_in_person_reviews()
+
+    check_other_meetings_are_linked_and_reported(error, jira_client, state_store)
+
+
+def test_meetings_updated_alongside_a_failed_meeting_update_are_still_linked(tmp_path):
+    tool, jira_client, state_store = create_tool(tmp_path)
+
+    with pytest.raises(Exception) as error:
+        asyncio.run(tool.schedule_in_person_reviews_async())
+
+    check_other_meetings_are_linked_and_reported(error, jira_client, state_store)
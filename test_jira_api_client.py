@@ -0,0 +1,25 @@
+import math
+
+import pytest
+
+from fake_api_clients import FakeBackend, create_fake_clients, get_fake_review_board
+
+
+@pytest.mark.parametrize('page_size', [100, 30])
+def test_search_yields_every_issue_once_when_jira_caps_the_page_size(tmp_path, page_size):
+    backend = FakeBackend(page_size=page_size)
+    _, jira_client, _ = create_fake_clients(backend, get_fake_review_board(str(tmp_path)), 2, 250,
+                                            rate_limited=False)
+
+    keys = [issue.key for issue in jira_client.get_issues_to_assign()]
+
+    assert keys == ['MDR-{}'.format(index) for index in range(250)]
+    assert backend.call_counts['jira.search_issues'] == math.ceil(250 / page_size)
+
+
+def test_search_with_no_matches_makes_one_call(tmp_path):
+    backend = FakeBackend()
+    _, jira_client, _ = create_fake_clients(backend, get_fake_review_board(str(tmp_path)), 2, 0, rate_limited=False)
+
+    assert list(jira_client.get_issues_to_assign()) == []
+    assert backend.call_counts['jira.search_issues'] == 1
@@ -0,0 +1,51 @@
+import base64
+from email import message_from_bytes
+
+from fake_api_clients import FakeBackend, create_fake_clients, get_fake_review_board
+from job_runner import run_job
+from toolbox import UpdateType
+
+
+def create_clients(tmp_path):
+    return create_fake_clients(FakeBackend(), get_fake_review_board(str(tmp_path)), 2, 0, rate_limited=False)
+
+
+def get_sent_messages(google_client):
+    return [message_from_bytes(base64.urlsafe_b64decode(message['raw']))
+            for message in google_client.mail_service.sent_messages]
+
+
+def fail():
+    raise Exception('Something went wrong')
+
+
+def test_a_failed_job_is_paged_and_its_run_summary_is_kept(tmp_path):
+    google_client, _, state_store = create_clients(tmp_path)
+
+    run_job(UpdateType.SENIOR_REVIEWER_ASSIGNMENT, google_client, state_store, fail)
+
+    messages = get_sent_messages(google_client)
+    assert [message['to'] for message in messages] == [google_client.pagerduty_email]
+    assert 'Something went wrong' in messages[0].get_payload()
+    assert [update_type for _, update_type, _, _ in state_store.get_run_summaries()] == \
+        [UpdateType.SENIOR_REVIEWER_ASSIGNMENT.value]
+    assert (tmp_path / 'senior_reviewer_assignment_metrics.json').exists()
+
+
+def test_the_update_digest_does_not_keep_a_run_summary(tmp_path):
+    google_client, _, state_store = create_clients(tmp_path)
+
+    run_job(UpdateType.UPDATE_DIGEST, google_client, state_store, lambda: None)
+
+    assert get_sent_messages(google_client) == []
+    assert state_store.get_run_summaries() == []
+
+
+def test_a_job_is_skipped_while_another_run_holds_its_lock(tmp_path):
+    google_client, _, state_store = create_clients(tmp_path)
+    runs = []
+
+    with state_store.run_lock(UpdateType.SENIOR_REVIEWER_ASSIGNMENT.value):
+        run_job(UpdateType.SENIOR_REVIEWER_ASSIGNMENT, google_client, state_store, lambda: runs.append(1))
+
+    assert runs == []
@@ -0,0 +1,41 @@
+from review_slot_matcher import ReviewSlotMatcher
+
+
+def test_issues_sharing_a_guest_are_not_put_in_overlapping_slots():
+    matcher = ReviewSlotMatcher([(0, 60), (30, 90)], {})
+    assert matcher.match([{'a', 'b'}, {'a', 'c'}]) == {0: 0}
+
+
+def test_issues_sharing_a_guest_can_use_slots_that_do_not_overlap():
+    matcher = ReviewSlotMatcher([(0, 60), (30, 90), (120, 180)], {})
+    assert matcher.match([{'a', 'b'}, {'a', 'c'}]) == {0: 0, 1: 2}
+
+
+def test_issues_without_shared_guests_can_use_overlapping_slots():
+    matcher = ReviewSlotMatcher([(0, 60), (30, 90)], {})
+    assert matcher.match([{'a'}, {'b'}]) == {0: 0, 1: 1}
+
+
+def test_slots_a_guest_is_busy_for_are_skipped():
+    matcher = ReviewSlotMatcher([(0, 60), (60, 120)], {'a': [(10, 20)]})
+    assert matcher.match([{'a', 'b'}]) == {0: 1}
+
+
+def test_issue_is_not_scheduled_when_a_guest_is_busy_for_every_slot():
+    matcher = ReviewSlotMatcher([(0, 60), (60, 120)], {'a': [(0, 30), (90, 100)]})
+    assert matcher.match([{'a'}, {'b'}]) == {1: 0}
+
+
+def test_older_issues_get_the_earliest_slots():
+    matcher = ReviewSlotMatcher([(100, 160), (0, 60)], {})
+    assert matcher.match([{'a'}, {'b'}]) == {0: 1, 1: 0}
+
+
+def test_older_issues_win_when_there_are_not_enough_slots():
+    matcher = ReviewSlotMatcher([(0, 60)], {})
+    assert matcher.match([{'a'}, {'b'}, {'c'}]) == {0: 0}
+
+
+def test_older_issue_is_moved_when_that_lets_a_newer_one_be_scheduled():
+    matcher = ReviewSlotMatcher([(0, 60), (60, 120)], {'b': [(60, 120)]})
+    assert matcher.match([{'a'}, {'b'}]) == {0: 1, 1: 0}
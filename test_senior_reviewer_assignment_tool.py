@@ -0,0 +1,58 @@
+import pytest
+
+from fake_api_clients import FakeBackend, create_fake_clients, get_fake_review_board, get_fake_reviewer_emails
+from senior_reviewer_assignment_tool import SeniorReviewAssignmentTool
+from toolbox import UpdateType
+
+
+def create_tool(tmp_path, count_reviewers, count_issues, reviewer_capacities=None, saved_queue=None):
+    board = get_fake_review_board(str(tmp_path), reviewer_capacities)
+    google_client, jira_client, state_store = create_fake_clients(FakeBackend(), board, count_reviewers, count_issues,
+                                                                  rate_limited=False)
+    if saved_queue is not None:
+        state_store.save_reviewer_queue(saved_queue)
+    return SeniorReviewAssignmentTool(google_client, jira_client, state_store), jira_client, state_store
+
+
+def get_assigned_issue_keys(jira_client):
+    return [issue.key for issue in jira_client.jira.issues if issue.fields.customfield_18441 is not None]
+
+
+def test_issues_are_assigned_up_to_capacity_and_the_rest_are_reported(tmp_path):
+    emails = get_fake_reviewer_emails(2)
+    tool, jira_client, state_store = create_tool(tmp_path, 2, 25, {email: 10 for email in emails})
+
+    with pytest.raises(Exception) as error:
+        tool.assign_sr_reviewers_to_open_tickets()
+
+    assert get_assigned_issue_keys(jira_client) == ['MDR-{}'.format(index) for index in range(20)]
+    assert 'No Available Senior Reviewers for issues: ["MDR-20", "MDR-21", "MDR-22", "MDR-23", "MDR-24"]' \
+        in str(error.value)
+    assert 'Failed to assign' not in str(error.value)
+    # What could be assigned is still saved and sent out with the next digest
+    assert sorted(state_store.get_reviewer_queue()) == sorted(emails)
+    spooled = [update for _, update_type, update, _ in state_store.get_spooled_updates()
+               if update_type == UpdateType.SENIOR_REVIEWER_ASSIGNMENT.value]
+    assert len(spooled) == 20
+
+
+def test_reviewers_without_a_capacity_have_no_limit(tmp_path):
+    tool, jira_client, _ = create_tool(tmp_path, 2, 25)
+
+    tool.assign_sr_reviewers_to_open_tickets()
+
+    assert len(get_assigned_issue_keys(jira_client)) == 25
+
+
+def test_saved_queue_order_is_kept_and_new_reviewers_go_first(tmp_path):
+    emails = get_fake_reviewer_emails(4)
+    tool, _, _ = create_tool(tmp_path, 4, 0, saved_queue=[emails[2], emails[0], emails[1]])
+
+    assert [reviewer.email for reviewer in tool.reviewers] == [emails[3], emails[2], emails[0], emails[1]]
+
+
+def test_reviewers_who_left_the_group_are_dropped_from_the_queue(tmp_path):
+    emails = get_fake_reviewer_emails(2)
+    tool, _, _ = create_tool(tmp_path, 2, 0, saved_queue=[emails[1], 'left@pinterest.com', emails[0]])
+
+    assert [reviewer.email for reviewer in tool.reviewers] == [emails[1], emails[0]]
@@ -1,18 +1,44 @@
+from datetime import datetime, timezone
 from enum import Enum
 
 
 class UpdateType(Enum):
     SENIOR_REVIEWER_ASSIGNMENT = 'SENIOR REVIEWER ASSIGNMENT'
     IN_PERSON_DESIGN_REVIEW_SCHEDULER = 'IN PERSON DESIGN REVIEW SCHEDULER'
+    UPDATE_DIGEST = 'UPDATE DIGEST'
+
+
+class UpdateStatus(Enum):
+    SUCCESS = 'SUCCESS'
+    FAILED = 'FAILED'
+
+    @staticmethod
+    def describe(error):
+        # Used in update emails so that partial failures are reported accurately
+        return UpdateStatus.SUCCESS.value if error is None else '{}: {}'.format(UpdateStatus.FAILED.value, error)
 
 
 class Reviewer:
     PINTEREST_EMAIL_SUFFIX = '@pinterest.com'
 
-    def __init__(self, email, is_available):
+    def __init__(self, email, is_available, days_available=0, open_issue_count=0, capacity=None, queue_position=0):
         self.email = email
         self.ldap = Reviewer.get_ldap_from_pinterest_email(email)
         self.is_available = is_available
+        self.days_available = days_available
+        self.open_issue_count = open_issue_count
+        # Max number of open issues the reviewer should have -- None means no limit
+        self.capacity = capacity
+        # Used to break ties between reviewers with the same load -- lower goes first
+        self.queue_position = queue_position
+
+    def has_capacity(self):
+        return self.capacity is None or self.open_issue_count < self.capacity
+
+    # Share of capacity in use -- reviewers with no limit are compared on their raw open issue count. Reviewers at
+    # capacity are ordered separately (see SeniorReviewAssignmentTool) so the two scales never decide who has room
+    def get_load(self):
+        return self.open_issue_count / self.capacity if self.capacity else float(self.open_issue_count)
 
     @staticmethod
     def get_ldap_from_pinterest_email(email):
@@ -20,4 +46,13 @@ class Reviewer:
 
     @staticmethod
     def get_pinterest_email_from_ldap(ldap):
-        return ldap + Reviewer.PINTEREST_EMAIL_SUFFIX
\ No newline at end of file
+        return ldap + Reviewer.PINTEREST_EMAIL_SUFFIX
+
+
+class CalendarTime:
+    @staticmethod
+    def to_timestamp(event_time):
+        # Google returns either a dateTime (RFC3339) or, for all day events, a date -- treat dates as midnight UTC
+        if event_time.get('dateTime') is not None:
+            return datetime.fromisoformat(event_time.get('dateTime').replace('Z', '+00:00')).timestamp()
+        return datetime.fromisoformat(event_time.get('date')).replace(tzinfo=timezone.utc).timestamp()
@@ -0,0 +1,49 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from toolbox import UpdateType
+
+
+class UpdateDigestTool:
+    # Both tools spool their updates to the state store rather than emailing every run -- this sends whatever has
+    # built up since the last digest as one email per update type, and nothing at all if there were no updates. The API
+    # call summary of every run since the last digest goes out with the updates of the same type
+
+    def __init__(self, google_api_client, state_store):
+        self.google_api_client = google_api_client
+        self.state_store = state_store
+
+    def send_update_digest(self):
+        spooled_updates = self.state_store.get_spooled_updates()
+        run_summaries = self.state_store.get_run_summaries()
+
+        updates_by_type = defaultdict(list)
+        ids_by_type = defaultdict(list)
+        for row_id, update_type, update, _ in spooled_updates:
+            updates_by_type[UpdateType(update_type)].append(update)
+            ids_by_type[UpdateType(update_type)].append(row_id)
+
+        run_summaries_by_type = defaultdict(list)
+        run_summary_ids_by_type = defaultdict(list)
+        for row_id, update_type, summary, recorded_at in run_summaries:
+            run_summaries_by_type[UpdateType(update_type)].append('{recorded_at}: {summary}'.format(
+                recorded_at=datetime.fromtimestamp(recorded_at, timezone.utc).isoformat(timespec='seconds'),
+                summary=summary))
+            run_summary_ids_by_type[UpdateType(update_type)].append(row_id)
+
+        errors_by_type = {}
+        if len(updates_by_type) > 0:
+            errors_by_type = self.google_api_client.send_update_digests(
+                dict(updates_by_type), {update_type: run_summaries_by_type[update_type]
+                                        for update_type in updates_by_type})
+        # Only drop what was sent -- anything else stays spooled and goes out with the next digest. Summaries of runs
+        # that made no updates have nothing to go out with and are dropped (they are still in the run summary files)
+        self.state_store.delete_spooled_updates(
+            [row_id for update_type, ids in ids_by_type.items() if update_type not in errors_by_type for row_id in ids])
+        self.state_store.delete_run_summaries(
+            [row_id for update_type, ids in run_summary_ids_by_type.items() if update_type not in errors_by_type
+             for row_id in ids])
+
+        if len(errors_by_type) > 0:
+            raise Exception("Failed to send update digests for: " + ", ".join(
+                '{}: {}'.format(update_type.value, error) for update_type, error in errors_by_type.items()))